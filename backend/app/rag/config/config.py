@@ -28,6 +28,10 @@ class Config:
         QDRANT_PORT = int(os.getenv('QDRANT_PORT', 6333))
         QDRANT_USE_SSL = os.getenv('QDRANT_USE_SSL', 'false').lower() == 'true'
     QDRANT_COLLECTION_NAME = os.getenv('QDRANT_COLLECTION_NAME', 'orris_rag')
+    # gRPC is much faster for bulk upserts; opt in where the port is exposed
+    QDRANT_PREFER_GRPC = os.getenv('QDRANT_PREFER_GRPC', 'false').lower() == 'true'
+    QDRANT_GRPC_PORT = int(os.getenv('QDRANT_GRPC_PORT', 6334))
+    QDRANT_UPSERT_WORKERS = int(os.getenv('QDRANT_UPSERT_WORKERS', 4))
     
     # Nomic
     NOMIC_API_KEY = os.getenv('NOMIC_API_KEY')
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List
 from uuid import uuid4
+import os
 
 try:
     import tiktoken  # type: ignore
@@ -17,37 +18,62 @@ except Exception:  # fallback for older installations
 from app.rag.core.schemas import DocumentChunk, ChunkMeta
 
 
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """Load the cl100k_base encoder once per process; None if tiktoken is unavailable."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        if tiktoken is not None:
+            try:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception:
+                _encoding = None
+        _encoding_loaded = True
+    return _encoding
+
+
 def _estimate_token_count(text: str) -> int:
     """Rough token estimate for metadata; best-effort fallback if tiktoken is unavailable."""
     if not text:
         return 0
-    if tiktoken is None:
+    enc = _get_encoding()
+    if enc is None:
         # Heuristic: ~4 chars per token average
         return max(1, len(text) // 4)
-    try:
-        enc = tiktoken.get_encoding("cl100k_base")
-    except Exception:
-        return max(1, len(text) // 4)
     return len(enc.encode(text))
 
 
+def _estimate_token_counts(texts: List[str]) -> List[int]:
+    """Batch form of _estimate_token_count; tiktoken encodes the batch across threads."""
+    enc = _get_encoding()
+    if enc is None:
+        return [_estimate_token_count(text) for text in texts]
+    num_threads = min(8, os.cpu_count() or 1)
+    return [len(tokens) for tokens in enc.encode_ordinary_batch(texts, num_threads=num_threads)]
+
+
 def chunk_elements(
-    elements: List[Dict[str, Any]],
+    elements: Iterable[Dict[str, Any]],
 ) -> List[DocumentChunk]:
     """Convert normalized elements from loaders into DocumentChunk objects.
     
     Elements are already chunked by unstructured, so we just convert format.
+    Any iterable of elements is accepted; it is consumed once.
     """
     
     chunks: List[DocumentChunk] = []
     running_index = 0
 
-    for el in elements:
-        text: str = el.get("text") or ""
-        meta_dict: Dict[str, Any] = dict(el.get("meta") or {})
+    kept = [el for el in elements if (el.get("text") or "").strip()]
+    token_counts = _estimate_token_counts([el["text"] for el in kept])
 
-        if not text.strip():
-            continue
+    for el, token_count in zip(kept, token_counts):
+        text: str = el["text"]
+        # Read-only here: ChunkMeta gets a fresh merged dict below
+        meta_dict: Dict[str, Any] = el.get("meta") or {}
 
         # Debug: Check if image_base64 is present
         if meta_dict.get("is_image") and "image_base64" in meta_dict:
@@ -57,9 +83,9 @@ def chunk_elements(
 
         meta = ChunkMeta(**{
             **meta_dict,
-            "chunk_id": str(uuid4()),
+            "chunk_id": uuid4().hex,  # Qdrant accepts the simple (unhyphenated) UUID form
             "chunk_index": running_index,
-            "token_count": _estimate_token_count(text),
+            "token_count": token_count,
         })
         chunks.append(DocumentChunk(text=text, meta=meta))
         running_index += 1
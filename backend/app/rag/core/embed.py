@@ -1,14 +1,27 @@
 from __future__ import annotations
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import List, Optional
+import atexit
+import hashlib
+import logging
 import os
+import threading
+import time
 import httpx
 import numpy as np
 import sys
 from app.core.config import get_settings
 
+try:
+    import faiss  # type: ignore
+except Exception:  # pragma: no cover
+    faiss = None  # type: ignore
+
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 # Set the desired model as the default and only option.
 DEFAULT_EMBEDDING_MODEL = "BAAI/bge-large-en-v1.5"
@@ -16,6 +29,96 @@ DEFAULT_EMBEDDING_MODEL = "BAAI/bge-large-en-v1.5"
 # Empty the fallback list to ensure only the default model is used.
 FALLBACK_MODELS = []
 
+# Per-request limits for the HF Inference API: an estimated token budget per
+# batch and a cap on the raw text size (HF rejects bodies over ~2 MB).
+DEFAULT_EMBED_TOKEN_BUDGET = 32000
+MAX_BATCH_CHARS = 1_500_000
+
+# Vectors kept per client for texts seen in earlier calls (~4 KB each at 1024 dims).
+DEFAULT_EMBED_CACHE_SIZE = 4096
+
+# Number of API batches encoded concurrently (the shared pool allows 10 connections).
+DEFAULT_EMBED_CONCURRENCY = 4
+
+# Retries for HF rate limiting (429), with exponential backoff.
+RATE_LIMIT_RETRIES = 3
+RATE_LIMIT_BACKOFF_SECONDS = 2.0
+
+# One connection pool shared by every EmbeddingClient in the process.
+_HTTP_CLIENT: Optional[httpx.Client] = None
+_HTTP_CLIENT_LOCK = threading.Lock()
+
+
+def _get_http_client() -> httpx.Client:
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None:
+        with _HTTP_CLIENT_LOCK:
+            if _HTTP_CLIENT is None:
+                # HTTP/2 lets concurrent batches multiplex over one TLS connection
+                _HTTP_CLIENT = httpx.Client(
+                    http2=True,
+                    timeout=90.0,  # Long timeout for model loading
+                    limits=httpx.Limits(max_keepalive_connections=5, max_connections=10)
+                )
+    return _HTTP_CLIENT
+
+
+def _close_http_client() -> None:
+    global _HTTP_CLIENT
+    with _HTTP_CLIENT_LOCK:
+        if _HTTP_CLIENT is not None:
+            _HTTP_CLIENT.close()
+            _HTTP_CLIENT = None
+
+
+def _reset_http_client() -> None:
+    """Drop the inherited pool in a forked child; its sockets belong to the parent."""
+    global _HTTP_CLIENT, _HTTP_CLIENT_LOCK
+    _HTTP_CLIENT = None
+    _HTTP_CLIENT_LOCK = threading.Lock()
+
+
+atexit.register(_close_http_client)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_http_client)
+
+
+def _iter_token_batches(texts: List[str], max_batch_size: int, token_budget: int):
+    """Greedily group texts into batches bounded by count, estimated tokens and size.
+
+    Tokens are estimated at ~4 chars per token, which is enough to keep long
+    chunks from overflowing a request while letting short snippets fill a batch.
+    """
+    batch: List[str] = []
+    batch_tokens = 0
+    batch_chars = 0
+    for text in texts:
+        tokens = max(1, len(text) // 4)
+        if batch and (
+            len(batch) >= max_batch_size
+            or batch_tokens + tokens > token_budget
+            or batch_chars + len(text) > MAX_BATCH_CHARS
+        ):
+            yield batch
+            batch, batch_tokens, batch_chars = [], 0, 0
+        batch.append(text)
+        batch_tokens += tokens
+        batch_chars += len(text)
+    if batch:
+        yield batch
+
+
+def _post_with_rate_limit_retry(client: httpx.Client, url: str, headers: dict, payload: dict) -> httpx.Response:
+    """POST to the inference API, backing off and retrying while it answers 429."""
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        response = client.post(url, headers=headers, json=payload)
+        if response.status_code != 429 or attempt == RATE_LIMIT_RETRIES:
+            return response
+        wait_time = RATE_LIMIT_BACKOFF_SECONDS * (2 ** attempt)
+        logger.warning("HF inference API rate limited, retrying in %.1fs", wait_time)
+        time.sleep(wait_time)
+    return response
+
 
 @dataclass
 class EmbeddingInfo:
@@ -37,10 +140,17 @@ class EmbeddingClient:
         self._model_name = model_name
         self._dimension: Optional[int] = None
         self._api_url = f"https://api-inference.huggingface.co/models/{model_name}"
-        self._client: Optional[httpx.Client] = None
         self._api_key: Optional[str] = None
         self._model_tested = False
         self._model_works = False
+        self._batch_fallbacks = 0
+        # LRU of BLAKE2b(text) -> embedding, shared across encode_texts calls
+        self._cache: OrderedDict[bytes, np.ndarray] = OrderedDict()
+        self._cache_size = int(getattr(settings, 'EMBED_CACHE_SIZE', DEFAULT_EMBED_CACHE_SIZE))
+        self._cache_lock = threading.Lock()
+        # Batches are encoded on worker threads; model probing, the fallback
+        # switch and the fallback counter are updated under this lock
+        self._state_lock = threading.RLock()
         # Set numpy print options to see the full array in the console
         np.set_printoptions(threshold=sys.maxsize)
 
@@ -51,14 +161,16 @@ class EmbeddingClient:
     @property
     def dimension(self) -> int:
         if self._dimension is None:
-            # Probe dimension with a test encoding
-            test_embedding = self._encode_single_text("test")
-            self._dimension = len(test_embedding)
+            with self._state_lock:
+                if self._dimension is None:
+                    # Probe dimension with a test encoding
+                    test_embedding = self._encode_single_text("test")
+                    self._dimension = len(test_embedding)
         return self._dimension
 
     def _get_client_and_headers(self):
-        """Lazy initialization of HTTP client and headers."""
-        if self._client is None:
+        """Return the shared HTTP client and this client's auth headers."""
+        if self._api_key is None:
             # Check for API key only when actually needed
             self._api_key = getattr(settings, 'huggingface_api_key', None)
             if not self._api_key:
@@ -66,14 +178,9 @@ class EmbeddingClient:
                     "huggingface_api_key environment variable is required for Hugging Face Inference API. "
                     "Please add it to your .env file or settings."
                 )
-            
-            self._client = httpx.Client(
-                timeout=90.0,  # Long timeout for model loading
-                limits=httpx.Limits(max_keepalive_connections=5, max_connections=10)
-            )
         
         headers = {"Authorization": f"Bearer {self._api_key}"}
-        return self._client, headers
+        return _get_http_client(), headers
 
     def _try_model(self, model_name: str, text: str) -> np.ndarray:
         """Try to encode text with a specific model."""
@@ -89,7 +196,7 @@ class EmbeddingClient:
             }
         }
         
-        response = client.post(api_url, headers=headers, json=payload)
+        response = _post_with_rate_limit_retry(client, api_url, headers, payload)
         response.raise_for_status()
         
         result = response.json()
@@ -119,61 +226,61 @@ class EmbeddingClient:
     def _encode_single_text(self, text: str) -> np.ndarray:
         """Encode a single text and return normalized embedding."""
         
-        # If we haven't tested the model yet, try the original model first
+        # If we haven't tested the model yet, try the original model first.
+        # Only one thread probes; the others wait and then use its outcome.
         if not self._model_tested:
-            try:
-                print(f"Testing model: {self._original_model_name}")
-                embedding = self._try_model(self._original_model_name, text)
-                self._model_tested = True
-                self._model_works = True
-                print(f"✅ {self._original_model_name} works! Using it for embeddings.")
-                return embedding
-                
-            except httpx.HTTPStatusError as e:
-                print(f"❌ {self._original_model_name} failed: {e.response.status_code}")
-                self._model_tested = True
-                self._model_works = False
-                
-                # Try fallback models (this list is now empty)
-                for fallback_model in FALLBACK_MODELS:
-                    try:
-                        print(f"Trying fallback model: {fallback_model}")
-                        embedding = self._try_model(fallback_model, text)
-                        
-                        # Switch to working model
-                        print(f"✅ Switched to {fallback_model}")
-                        self._model_name = fallback_model
-                        self._api_url = f"https://api-inference.huggingface.co/models/{fallback_model}"
-                        return embedding
-                        
-                    except Exception as fallback_error:
-                        print(f"❌ {fallback_model} also failed: {fallback_error}")
-                        continue
-                
-                # If all models fail, raise the original error
-                if e.response.status_code == 503:
-                    raise RuntimeError(
-                        f"Model {self._original_model_name} is loading on HF servers. This can take 1-2 minutes. Please wait and retry."
-                    )
-                elif e.response.status_code == 401:
-                    raise RuntimeError("Invalid Hugging Face API key")
-                elif e.response.status_code == 400:
-                    raise RuntimeError(
-                        f"Model {self._original_model_name} doesn't support feature extraction."
-                    )
-                else:
-                    raise RuntimeError(f"Model {self._original_model_name} failed. Error: {e.response.status_code} - {e.response.text}")
+            with self._state_lock:
+                if not self._model_tested:
+                    return self._probe_model(text)
+        return self._try_model(self._model_name, text)
+
+    def _probe_model(self, text: str) -> np.ndarray:
+        """Encode text with the original model, switching to a fallback if it fails."""
+        try:
+            print(f"Testing model: {self._original_model_name}")
+            embedding = self._try_model(self._original_model_name, text)
+            self._model_tested = True
+            self._model_works = True
+            print(f"✅ {self._original_model_name} works! Using it for embeddings.")
+            return embedding
+            
+        except httpx.HTTPStatusError as e:
+            print(f"❌ {self._original_model_name} failed: {e.response.status_code}")
+            self._model_tested = True
+            self._model_works = False
+            
+            # Try fallback models (this list is now empty)
+            for fallback_model in FALLBACK_MODELS:
+                try:
+                    print(f"Trying fallback model: {fallback_model}")
+                    embedding = self._try_model(fallback_model, text)
                     
-            except Exception as e:
-                raise RuntimeError(f"Failed to encode text: {str(e)}")
-        
-        # Model already tested and working
-        elif self._model_works:
-            return self._try_model(self._model_name, text)
-        
-        # Model tested but not working, use current fallback
-        else:
-            return self._try_model(self._model_name, text)
+                    # Switch to working model
+                    print(f"✅ Switched to {fallback_model}")
+                    self._model_name = fallback_model
+                    self._api_url = f"https://api-inference.huggingface.co/models/{fallback_model}"
+                    return embedding
+                    
+                except Exception as fallback_error:
+                    print(f"❌ {fallback_model} also failed: {fallback_error}")
+                    continue
+            
+            # If all models fail, raise the original error
+            if e.response.status_code == 503:
+                raise RuntimeError(
+                    f"Model {self._original_model_name} is loading on HF servers. This can take 1-2 minutes. Please wait and retry."
+                )
+            elif e.response.status_code == 401:
+                raise RuntimeError("Invalid Hugging Face API key")
+            elif e.response.status_code == 400:
+                raise RuntimeError(
+                    f"Model {self._original_model_name} doesn't support feature extraction."
+                )
+            else:
+                raise RuntimeError(f"Model {self._original_model_name} failed. Error: {e.response.status_code} - {e.response.text}")
+                
+        except Exception as e:
+            raise RuntimeError(f"Failed to encode text: {str(e)}")
 
     def _encode_batch(self, texts: List[str]) -> np.ndarray:
         """Encode multiple texts in a single API call."""
@@ -188,11 +295,7 @@ class EmbeddingClient:
         }
         
         try:
-            response = client.post(
-                self._api_url,
-                headers=headers,
-                json=payload
-            )
+            response = _post_with_rate_limit_retry(client, self._api_url, headers, payload)
             response.raise_for_status()
             
             result = response.json()
@@ -211,9 +314,14 @@ class EmbeddingClient:
                 raise RuntimeError(f"Expected {len(texts)} embeddings, got {embeddings.shape[0]}")
             
             # L2 normalize each embedding
-            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
-            norms = np.where(norms > 0, norms, 1)  # Avoid division by zero
-            embeddings = embeddings / norms
+            if faiss is not None:
+                # Single in-place SIMD pass; faiss requires C-contiguous float32
+                embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+                faiss.normalize_L2(embeddings)
+            else:
+                norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+                norms = np.where(norms > 0, norms, 1)  # Avoid division by zero
+                embeddings = embeddings / norms
 
             # --- Added for debugging ---
             print("--- Batch Embeddings Generated ---")
@@ -237,44 +345,81 @@ class EmbeddingClient:
         except Exception as e:
             raise RuntimeError(f"Failed to encode texts: {str(e)}")
 
+    def _encode_batch_with_fallback(self, texts: List[str]) -> np.ndarray:
+        """Encode a batch, falling back to one request per text if the batch call fails.
+
+        Only API/transport failures trigger the fallback; anything else (e.g.
+        KeyboardInterrupt, MemoryError) propagates unchanged.
+        """
+        try:
+            return self._encode_batch(texts)
+        except (httpx.HTTPError, RuntimeError) as e:
+            with self._state_lock:
+                self._batch_fallbacks += 1
+                fallback_number = self._batch_fallbacks
+            logger.warning(
+                "Batch encoding of %d texts failed, falling back to individual encoding "
+                "(fallback #%d): %s", len(texts), fallback_number, e, exc_info=True
+            )
+            return np.vstack([self._encode_single_text(text) for text in texts])
+
     def encode_texts(self, texts: List[str]) -> np.ndarray:
         if not texts:
             # The dimension might not be probed yet if input is empty
-            if self._dimension is None:
-                self._dimension = 1024 # Manually set dimension for the chosen model
+            with self._state_lock:
+                if self._dimension is None:
+                    self._dimension = 1024 # Manually set dimension for the chosen model
             return np.zeros((0, self.dimension), dtype=np.float32)
-        
+
+        # Embed each distinct text once (repeated headers/boilerplate are common)
+        # and scatter the vectors back to the original positions.
+        unique_index = {}
+        for text in texts:
+            unique_index.setdefault(text, len(unique_index))
+        if len(unique_index) < len(texts):
+            unique_embeddings = self.encode_texts(list(unique_index))
+            return unique_embeddings[[unique_index[text] for text in texts]]
+
+        # Reuse vectors for texts embedded by earlier calls (the same boilerplate
+        # chunk in another document) and only send the misses to the API.
+        keys = [hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest() for text in texts]
+        with self._cache_lock:
+            vectors = {}
+            for key in keys:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    vectors[key] = self._cache[key]
+        missing = [i for i, key in enumerate(keys) if key not in vectors]
+        if missing:
+            fresh = self._encode_uncached([texts[i] for i in missing])
+            with self._cache_lock:
+                for row, i in enumerate(missing):
+                    vectors[keys[i]] = fresh[row]
+                    self._cache[keys[i]] = fresh[row]
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+            if len(missing) == len(texts):
+                return fresh
+        return np.vstack([vectors[key] for key in keys])
+
+    def _encode_uncached(self, texts: List[str]) -> np.ndarray:
+        """Encode distinct texts through the API in token-bounded batches."""
         batch_size = getattr(settings, 'EMBED_BATCH_SIZE', 16)  # Smaller batch for API
         if isinstance(batch_size, str):
             batch_size = int(batch_size)
+        token_budget = int(getattr(settings, 'EMBED_TOKEN_BUDGET', DEFAULT_EMBED_TOKEN_BUDGET))
+        batches = list(_iter_token_batches(texts, batch_size, token_budget))
         
         # For small batches, try batch API first
-        if len(texts) <= batch_size:
-            try:
-                return self._encode_batch(texts)
-            except:
-                # Fall back to individual encoding
-                print(f"Batch encoding failed, falling back to individual encoding")
-                embeddings = []
-                for text in texts:
-                    embedding = self._encode_single_text(text)
-                    embeddings.append(embedding)
-                return np.vstack(embeddings)
+        if len(batches) == 1:
+            return self._encode_batch_with_fallback(texts)
         
-        # For larger requests, split into batches
-        all_embeddings = []
-        for i in range(0, len(texts), batch_size):
-            batch_texts = texts[i:i + batch_size]
-            try:
-                batch_embeddings = self._encode_batch(batch_texts)
-                all_embeddings.append(batch_embeddings)
-            except:
-                # Fall back to individual encoding for this batch
-                batch_embeddings = []
-                for text in batch_texts:
-                    embedding = self._encode_single_text(text)
-                    batch_embeddings.append(embedding)
-                all_embeddings.append(np.vstack(batch_embeddings))
+        # For larger requests, encode the token-bounded batches concurrently.
+        # The first batch runs alone so model probing/fallback settles once.
+        all_embeddings = [self._encode_batch_with_fallback(batches[0])]
+        concurrency = int(getattr(settings, 'EMBED_CONCURRENCY', DEFAULT_EMBED_CONCURRENCY))
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            all_embeddings.extend(pool.map(self._encode_batch_with_fallback, batches[1:]))
         
         final_embeddings = np.vstack(all_embeddings)
 
@@ -286,11 +431,6 @@ class EmbeddingClient:
         
         return final_embeddings
 
-    def __del__(self):
-        """Clean up HTTP client on deletion."""
-        if hasattr(self, '_client') and self._client is not None:
-            self._client.close()
-
 
 _singleton_client: Optional[EmbeddingClient] = None
 
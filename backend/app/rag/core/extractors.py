@@ -1,28 +1,126 @@
 from __future__ import annotations
 
 from typing import Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import io
+import mmap
+import os
+import shutil
 import zipfile
 
 
-def extract_pdf_images(pdf_path: str, out_dir: str) -> Dict[int, List[str]]:
-    """Extract images from a PDF file into out_dir.
+# PDFs with fewer pages than this are extracted in-process; below it the
+# cost of starting worker processes outweighs the parallel speedup.
+PARALLEL_PDF_MIN_PAGES = 16
+MAX_PDF_WORKERS = 4
 
-    Returns a mapping: page_number (1-based) -> list of image file paths in reading order.
-    Requires PyMuPDF (fitz).
-    """
+# The vision model downsizes anything larger than this before reading it, so
+# bigger images only cost PNG encoding, disk, base64 and upload time.
+MAX_IMAGE_SIDE = 2048
+
+# Icons, bullets and rules below this pixel area carry nothing worth a vision
+# summary; skip them before decoding.
+MIN_IMAGE_AREA = 10000
+
+
+# PDF bytes handed to each worker process once by the pool initializer, so
+# per-range tasks do not re-send or re-read the file.
+_worker_pdf_data: Optional[bytes] = None
+
+
+def _import_fitz():
     try:
         import fitz  # type: ignore
     except Exception as e:
         raise RuntimeError("PyMuPDF (fitz) is required for PDF image extraction") from e
+    return fitz
 
-    pdf = fitz.open(pdf_path)
-    out_root = Path(out_dir)
-    out_root.mkdir(parents=True, exist_ok=True)
+
+def _read_pdf_bytes(pdf_path: str) -> bytes:
+    """Read the PDF once through a read-only mmap (no buffered-read copies)."""
+    with open(pdf_path, "rb") as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file cannot be mapped
+            return f.read()
+        try:
+            return bytes(data)
+        finally:
+            data.close()
+
+
+def _init_pdf_worker(pdf_data: bytes) -> None:
+    global _worker_pdf_data
+    _worker_pdf_data = pdf_data
+
+
+def extract_pdf_images(
+    pdf_path: str,
+    out_dir: str,
+    *,
+    data: Optional[bytes] = None,
+    parallel: bool = True,
+) -> Dict[int, List[str]]:
+    """Extract images from a PDF file into out_dir.
+
+    Returns a mapping: page_number (1-based) -> list of image file paths in reading order.
+    Requires PyMuPDF (fitz). Large PDFs are split into page ranges that are
+    extracted in parallel worker processes (PyMuPDF holds the GIL).
+    The file is read from disk once and parsed from memory everywhere else;
+    pass ``data`` when the PDF is already in memory to skip the read.
+    ``parallel=False`` keeps all pages in-process, for callers that already run
+    this inside a worker process.
+    """
+    fitz = _import_fitz()
+    pdf_data = data if data is not None else _read_pdf_bytes(pdf_path)
+    with fitz.open(stream=pdf_data, filetype="pdf") as pdf:
+        page_count = len(pdf)
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+
+    workers = min(os.cpu_count() or 1, MAX_PDF_WORKERS)
+    if not parallel or workers < 2 or page_count < PARALLEL_PDF_MIN_PAGES:
+        return _extract_pdf_page_range_images(pdf_data, out_dir, 0, page_count)
+
+    step = -(-page_count // workers)  # ceil division
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    page_to_paths: Dict[int, List[str]] = {}
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_pdf_worker, initargs=(pdf_data,)
+    ) as pool:
+        futures = [
+            pool.submit(_extract_pdf_page_range_images, None, out_dir, start, stop)
+            for start, stop in ranges
+        ]
+        for future in futures:
+            page_to_paths.update(future.result())
+    return page_to_paths
+
+
+def _extract_pdf_page_range_images(
+    pdf_data: Optional[bytes], out_dir: str, start: int, stop: int
+) -> Dict[int, List[str]]:
+    """Extract images for pages [start, stop) (0-based); top-level so worker processes can pickle it.
+
+    ``pdf_data`` of None means the bytes set by the worker initializer. fitz
+    documents cannot be shared across processes, so each worker parses its
+    own copy from memory.
+    """
+    fitz = _import_fitz()
+    pdf = fitz.open(stream=pdf_data if pdf_data is not None else _worker_pdf_data, filetype="pdf")
+    try:
+        return _extract_page_range(fitz, pdf, Path(out_dir), start, stop)
+    finally:
+        pdf.close()
+
+
+def _extract_page_range(fitz, pdf, out_root: Path, start: int, stop: int) -> Dict[int, List[str]]:
 
     page_to_paths: Dict[int, List[str]] = {}
-    for page_index in range(len(pdf)):
+    # Images reused across pages (logos, headers) share one xref; decode and
+    # write each of them once and point every page at the same file.
+    saved_xrefs: Dict[int, str] = {}
+    for page_index in range(start, stop):
         page = pdf.load_page(page_index)
         images = page.get_images(full=True)
         if not images:
@@ -30,41 +128,59 @@ def extract_pdf_images(pdf_path: str, out_dir: str) -> Dict[int, List[str]]:
         page_no = page_index + 1
         saved: List[str] = []
         for idx, img in enumerate(images):
-            xref = img[0]
+            xref, width, height = img[0], img[2], img[3]
+            if width * height < MIN_IMAGE_AREA:
+                continue
+            if xref in saved_xrefs:
+                saved.append(saved_xrefs[xref])
+                continue
             base = f"p{page_no:03d}_img{idx:03d}"
+            smask = img[1]
+            if not smask and max(width, height) <= MAX_IMAGE_SIDE:
+                # Plain gray/RGB JPEGs are written as stored: no decode + PNG re-encode
+                raw = pdf.extract_image(xref)
+                if raw and raw.get("ext") in ("jpeg", "jpg") and raw.get("colorspace") in (1, 3):
+                    out_path = out_root / f"{base}.jpg"
+                    out_path.write_bytes(raw["image"])
+                    saved_xrefs[xref] = str(out_path)
+                    saved.append(str(out_path))
+                    continue
             pix = fitz.Pixmap(pdf, xref)
-            # choose extension
-            ext = "png" if not pix.alpha else "png"
-            out_path = out_root / f"{base}.{ext}"
-            if pix.n >= 5:  # CMYK or other
-                pix = fitz.Pixmap(fitz.csRGB, pix)
-            pix.save(str(out_path))
+            try:
+                out_path = out_root / f"{base}.png"
+                if pix.n - pix.alpha >= 4:  # CMYK or other non-RGB
+                    pix = fitz.Pixmap(fitz.csRGB, pix)
+                while max(pix.width, pix.height) > MAX_IMAGE_SIDE:
+                    pix.shrink(1)  # halve both dimensions in place
+                pix.save(str(out_path))
+            finally:
+                pix = None  # free
+            saved_xrefs[xref] = str(out_path)
             saved.append(str(out_path))
-            pix = None  # free
         if saved:
             page_to_paths[page_no] = saved
-    pdf.close()
     return page_to_paths
 
 
-def extract_docx_images(docx_path: str, out_dir: str) -> List[str]:
+def extract_docx_images(docx_path: str, out_dir: str, *, data: Optional[bytes] = None) -> List[str]:
     """Extract embedded images from a DOCX into out_dir.
 
     Returns a list of file paths in approximate document order (as stored in /word/media).
+    ``data`` reads the DOCX from memory instead of docx_path.
     """
     out_root = Path(out_dir)
     out_root.mkdir(parents=True, exist_ok=True)
 
     paths: List[str] = []
-    with zipfile.ZipFile(docx_path) as z:
-        for name in z.namelist():
-            if name.startswith("word/media/") and not name.endswith("/"):
-                data = z.read(name)
-                filename = Path(name).name
-                out_path = out_root / filename
-                with open(out_path, "wb") as f:
-                    f.write(data)
-                paths.append(str(out_path))
+    with zipfile.ZipFile(io.BytesIO(data) if data is not None else docx_path) as z:
+        for info in z.infolist():
+            if info.is_dir() or not info.filename.startswith("word/media/"):
+                continue
+            out_path = out_root / Path(info.filename).name
+            # Stream member to disk instead of holding the whole image in memory
+            with z.open(info) as src, open(out_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, length=1 << 20)
+            paths.append(str(out_path))
     return paths
 
 
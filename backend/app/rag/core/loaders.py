@@ -1,17 +1,29 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional, Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Callable, Tuple
 from pathlib import Path
+import csv
+import io
+import mmap
 import os
 
-# NOTE: We import unstructured partitioners lazily inside functions to provide
-# clearer error messages and to allow partial environments.
-
-import pandas as pd
+# NOTE: We import unstructured partitioners (and pandas) lazily inside functions
+# to provide clearer error messages, to allow partial environments and to keep
+# them off the import path of callers that never load those file types.
 
 
 SUPPORTED_TYPES = {"pdf", "docx", "txt", "xlsx", "image"}
 IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp"}
+_EXT_MAP = {
+    ".pdf": "pdf",
+    ".docx": "docx",
+    ".txt": "txt",
+    ".log": "txt",
+    ".xlsx": "xlsx",
+    ".xls": "xlsx",
+    **{ext: "image" for ext in IMAGE_EXTS},
+}
 
 
 def detect_type(path: str) -> str:
@@ -21,18 +33,28 @@ def detect_type(path: str) -> str:
     Raises ValueError for unsupported extensions.
     """
 
-    ext = Path(path).suffix.lower()
-    if ext == ".pdf":
-        return "pdf"
-    if ext == ".docx":
-        return "docx"
-    if ext in {".txt", ".log"}:
-        return "txt"
-    if ext in {".xlsx", ".xls"}:
-        return "xlsx"
-    if ext in IMAGE_EXTS:
-        return "image"
-    raise ValueError(f"Unsupported file extension: {ext}")
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        return _EXT_MAP[ext]
+    except KeyError:
+        raise ValueError(f"Unsupported file extension: {ext}") from None
+
+
+_IMAGE_CATEGORIES = frozenset({"Image", "Figure"})
+
+
+def _is_blank(text: Optional[str]) -> bool:
+    """True for None, "" or whitespace-only text, without allocating a stripped copy."""
+    return not text or text.isspace()
+
+
+def _element_category(el: Any) -> str:
+    return getattr(el, "category", "") or getattr(el, "type", "")
+
+
+def _partition_source(path: str, data: Optional[bytes]) -> Dict[str, Any]:
+    """Keyword arguments pointing an unstructured partitioner at a path or in-memory bytes."""
+    return {"file": io.BytesIO(data)} if data is not None else {"filename": path}
 
 
 def _normalize_element(
@@ -42,124 +64,186 @@ def _normalize_element(
     is_table: bool = False,
     is_image: bool = False,
     source_page: Optional[int] = None,
+    **extra: Any,
 ) -> Dict[str, Any]:
-    meta = dict(base_meta)
-    meta.update(
-        {
-            "is_table": bool(is_table),
-            "is_image": bool(is_image),
-            "source_page": source_page,
-        }
-    )
+    # Build each element's meta in one dict display; extra keys (image
+    # summary/url/base64) go in here rather than via a second copy.
+    meta = {
+        **base_meta,
+        "is_table": bool(is_table),
+        "is_image": bool(is_image),
+        "source_page": source_page,
+        **extra,
+    }
     return {"text": text, "meta": meta}
 
 
+def _summarize_images(
+    paths: Iterable[str],
+    *,
+    summarize_image_fn: Optional[Callable[[str], str]] = None,
+    summarize_image_with_base64_fn: Optional[Callable[[str], tuple[str, str]]] = None,
+) -> Dict[str, tuple[Optional[str], Optional[str]]]:
+    """Summarize several images concurrently; returns path -> (summary, base64).
+
+    Up to VISION_CONCURRENCY (default 8) vision requests are in flight. A
+    failed image maps to (None, None) so the caller falls back to its text.
+    """
+    def _one(image_path: str) -> tuple[Optional[str], Optional[str]]:
+        try:
+            if summarize_image_with_base64_fn is not None:
+                return summarize_image_with_base64_fn(image_path)
+            return summarize_image_fn(image_path), None
+        except Exception as e:
+            print(f"[DEBUG] Failed to summarize image {image_path}: {e}")
+            return None, None
+
+    paths = list(paths)
+    if len(paths) <= 1:
+        return {p: _one(p) for p in paths}
+    workers = min(len(paths), max(1, int(os.getenv("VISION_CONCURRENCY", "8"))))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(paths, pool.map(_one, paths)))
+
+
+_partition_pdf = None
+_partition_docx = None
+
+
+def _get_partition_pdf():
+    """Import unstructured's PDF partitioner on first use and reuse it afterwards."""
+    global _partition_pdf
+    if _partition_pdf is None:
+        try:
+            from unstructured.partition.pdf import partition_pdf  # type: ignore
+        except Exception as e:
+            raise RuntimeError(
+                "unstructured.partition.pdf import failed. Install 'unstructured[pdf]' or 'unstructured[all-docs]'. "
+                f"Underlying error: {e}"
+            )
+        _partition_pdf = partition_pdf
+    return _partition_pdf
+
+
+def _get_partition_docx():
+    """Import unstructured's DOCX partitioner on first use and reuse it afterwards."""
+    global _partition_docx
+    if _partition_docx is None:
+        try:
+            from unstructured.partition.docx import partition_docx  # type: ignore
+        except Exception as e:
+            raise RuntimeError(
+                "unstructured.partition.docx import failed. Install 'unstructured[docx]' or 'unstructured[all-docs]'. "
+                f"Underlying error: {e}"
+            )
+        _partition_docx = partition_docx
+    return _partition_docx
+
+
 def load_pdf(
     path: str,
     base_meta: Dict[str, Any],
     *,
     summarize_image_fn: Optional[Callable[[str], str]] = None,
     summarize_image_with_base64_fn: Optional[Callable[[str], tuple[str, str]]] = None,
-    image_lookup: Optional[Callable[[int], List[str]]] = None,
+    image_lookup: Optional[Callable[[int], Optional[List[str]]]] = None,
+    data: Optional[bytes] = None,
 ) -> List[Dict[str, Any]]:
-    try:
-        from unstructured.partition.pdf import partition_pdf  # type: ignore
-    except Exception as e:
-        raise RuntimeError(
-            "unstructured.partition.pdf import failed. Install 'unstructured[pdf]' or 'unstructured[all-docs]'. "
-            f"Underlying error: {e}"
-        )
+    partition_pdf = _get_partition_pdf()
 
+    # "fast" reads the PDF text layer directly (camelot's "stream" analogue);
+    # table structure inference only runs under hi_res layout detection, so
+    # it is not requested here and Table elements keep their plain text.
     elements = partition_pdf(
-        filename=path,
+        **_partition_source(path, data),
         strategy="fast",
         chunking_strategy="by_title",
         max_characters=2000,
         new_after_n_chars=1800,
         overlap=200,
         combine_text_under_n_chars=200,
-        infer_table_structure=True,
     )
 
+    def _image_target(page_number: Optional[int]) -> str:
+        # Prefer extracted image if available for this page
+        img_paths = image_lookup(page_number) if (image_lookup and page_number) else []
+        return img_paths[0] if img_paths else path
+
+    # Every image element on a page resolves to the page's first extracted
+    # image, so each target file is read, encoded and summarized only once.
+    # The vision calls are network-bound; the distinct targets are summarized
+    # concurrently before the elements are normalized. image_lookup is
+    # consulted once per page that has image elements.
+    categories = [_element_category(el) for el in elements]
+    page_targets: Dict[Optional[int], str] = {}
+    for el, category in zip(elements, categories):
+        if category in _IMAGE_CATEGORIES:
+            page_number = getattr(el, "page_number", None)
+            if page_number not in page_targets:
+                page_targets[page_number] = _image_target(page_number)
+    image_results: Dict[str, tuple[Optional[str], Optional[str]]] = {}
+    if page_targets and (summarize_image_with_base64_fn is not None or summarize_image_fn is not None):
+        image_results = _summarize_images(
+            set(page_targets.values()),
+            summarize_image_fn=summarize_image_fn,
+            summarize_image_with_base64_fn=summarize_image_with_base64_fn,
+        )
+
     normalized: List[Dict[str, Any]] = []
-    for el in elements:
-        category = getattr(el, "category", "") or getattr(el, "type", "")
+    for el, category in zip(elements, categories):
         page_number = getattr(el, "page_number", None)
         text = getattr(el, "text", "") or ""
         is_table = category == "Table"
-        is_image = category in {"Image", "Figure"}
+        is_image = category in _IMAGE_CATEGORIES
         
         # Initialize image_base64 outside the image processing block
         image_base64: Optional[str] = None
+        image_target = path
 
         if is_image:
-            summary: Optional[str] = None
-            
+            image_target = page_targets[page_number]
+            summary, image_base64 = image_results.get(image_target, (None, None))
             if summarize_image_with_base64_fn is not None:
-                try:
-                    # Prefer extracted image if available for this page
-                    img_paths = image_lookup(page_number) if (image_lookup and page_number) else []
-                    target_img = img_paths[0] if img_paths else path
-                    summary, image_base64 = summarize_image_with_base64_fn(target_img)
-                    print(f"[DEBUG] Generated base64 for image: {len(image_base64) if image_base64 else 0} chars")
-                except Exception as e:
-                    print(f"[DEBUG] Failed to generate base64: {e}")
-                    summary = None
-                    image_base64 = None
-            elif summarize_image_fn is not None:
-                try:
-                    # Prefer extracted image if available for this page
-                    img_paths = image_lookup(page_number) if (image_lookup and page_number) else []
-                    target_img = img_paths[0] if img_paths else path
-                    summary = summarize_image_fn(target_img)
-                except Exception:
-                    summary = None
-            if summary and summary.strip():
+                print(f"[DEBUG] Generated base64 for image: {len(image_base64) if image_base64 else 0} chars")
+            if not _is_blank(summary):
                 text = summary
-            elif not text.strip():
+            elif _is_blank(text):
                 # Fallback placeholder for images without text
                 text = f"Image: {base_meta.get('source_doc_name', Path(path).name)}"
 
-        if not text.strip() and not is_table and not is_image:
+        if not is_table and not is_image and _is_blank(text):
             continue
 
-        elem = _normalize_element(
-            text=text,
-            base_meta=base_meta,
-            is_table=is_table,
-            is_image=is_image,
-            source_page=page_number,
-        )
+        extra: Dict[str, Any] = {}
         if is_image:
-            meta_with_summary = dict(elem["meta"])  # shallow copy
-            meta_with_summary["image_summary"] = text
+            extra["image_summary"] = text
             # record the first extracted image path, if any
-            if image_lookup and page_number:
-                img_paths = image_lookup(page_number)
-                if img_paths:
-                    meta_with_summary["image_url"] = img_paths[0]
+            if image_target != path:
+                extra["image_url"] = image_target
             # Store base64 encoding if available
             if image_base64:
-                meta_with_summary["image_base64"] = image_base64
+                extra["image_base64"] = image_base64
                 print(f"[DEBUG] Added image_base64 to metadata: {len(image_base64)} chars")
             else:
                 print("[DEBUG] No image_base64 to add to metadata")
-            elem["meta"] = meta_with_summary
-        normalized.append(elem)
+        normalized.append(
+            _normalize_element(
+                text=text,
+                base_meta=base_meta,
+                is_table=is_table,
+                is_image=is_image,
+                source_page=page_number,
+                **extra,
+            )
+        )
     return normalized
 
 
-def load_docx(path: str, base_meta: Dict[str, Any]) -> List[Dict[str, Any]]:
-    try:
-        from unstructured.partition.docx import partition_docx  # type: ignore
-    except Exception as e:
-        raise RuntimeError(
-            "unstructured.partition.docx import failed. Install 'unstructured[docx]' or 'unstructured[all-docs]'. "
-            f"Underlying error: {e}"
-        )
+def load_docx(path: str, base_meta: Dict[str, Any], *, data: Optional[bytes] = None) -> List[Dict[str, Any]]:
+    partition_docx = _get_partition_docx()
 
     try:
-        elements = partition_docx(filename=path)
+        elements = partition_docx(**_partition_source(path, data))
     except Exception as e:
         raise RuntimeError(
             "Failed to parse DOCX with unstructured. Consider installing 'unstructured[docx]' or 'all-docs'. "
@@ -167,11 +251,11 @@ def load_docx(path: str, base_meta: Dict[str, Any]) -> List[Dict[str, Any]]:
         )
     normalized: List[Dict[str, Any]] = []
     for el in elements:
-        category = getattr(el, "category", "") or getattr(el, "type", "")
+        category = _element_category(el)
         text = getattr(el, "text", "") or ""
         is_table = category == "Table"
 
-        if not text.strip() and not is_table:
+        if not is_table and _is_blank(text):
             continue
 
         normalized.append(
@@ -186,36 +270,77 @@ def load_docx(path: str, base_meta: Dict[str, Any]) -> List[Dict[str, Any]]:
     return normalized
 
 
-def load_txt(path: str, base_meta: Dict[str, Any]) -> List[Dict[str, Any]]:
+_txt_splitter = None
+
+
+def _get_txt_splitter():
+    """Build the plain-text splitter once.
+
+    Sizes are measured in cl100k tokens (500 tokens ~ the 2000 chars used for
+    PDFs) so chunks stay within the embedder's input window; falls back to
+    character counts when tiktoken is unavailable.
+    """
+    global _txt_splitter
+    if _txt_splitter is not None:
+        return _txt_splitter
     try:
         from langchain_text_splitters import RecursiveCharacterTextSplitter
     except ImportError:
         from langchain.text_splitter import RecursiveCharacterTextSplitter
 
-    p = Path(path)
+    separators = ["\n\n", "\n", " ", ""]
     try:
-        text = p.read_text(encoding="utf-8")
+        _txt_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            encoding_name="cl100k_base",
+            chunk_size=500,
+            chunk_overlap=50,
+            separators=separators,
+        )
+    except ImportError:
+        # Initialize the text splitter with same parameters as PDF
+        _txt_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=2000,
+            chunk_overlap=200,
+            length_function=len,
+            separators=separators,
+        )
+    return _txt_splitter
+
+
+def _decode_text(raw) -> str:
+    """Decode a bytes-like object as UTF-8, falling back to latin-1 without re-reading it."""
+    try:
+        return str(raw, "utf-8")
     except UnicodeDecodeError:
-        text = p.read_text(encoding="latin-1")
+        return str(raw, "latin-1")
+
+
+def _read_text_mapped(path: str) -> str:
+    # Decode straight from a read-only mapping so the file contents are never
+    # copied into an intermediate bytes object.
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return _decode_text(mm)
 
-    if not text.strip():
+
+def load_txt(path: str, base_meta: Dict[str, Any], *, data: Optional[bytes] = None) -> List[Dict[str, Any]]:
+    text = _decode_text(data) if data is not None else _read_text_mapped(path)
+    # Same universal-newline handling Path.read_text applied
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+
+    if _is_blank(text):
         return []
 
-    # Initialize the text splitter with same parameters as PDF
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=2000,
-        chunk_overlap=200,
-        length_function=len,
-        separators=["\n\n", "\n", " ", ""]
-    )
-    
     # Split the text into chunks
-    chunks = text_splitter.split_text(text)
+    chunks = _get_txt_splitter().split_text(text)
     
     # Convert chunks to normalized elements
     normalized = []
     for i, chunk in enumerate(chunks):
-        if chunk.strip():
+        if not _is_blank(chunk):
             normalized.append(
                 _normalize_element(
                     text=chunk,
@@ -229,20 +354,66 @@ def load_txt(path: str, base_meta: Dict[str, Any]) -> List[Dict[str, Any]]:
     return normalized
 
 
-def load_xlsx(path: str, base_meta: Dict[str, Any]) -> List[Dict[str, Any]]:
-    # Minimal approach: use pandas to read each sheet and serialize to CSV-like text
-    book = pd.read_excel(path, sheet_name=None)  # dict of sheet_name -> DataFrame
-    normalized: List[Dict[str, Any]] = []
-    for sheet_name, df in book.items():
-        if df.empty:
-            continue
-        # Convert to CSV-like text for MVP (markdown optional later)
-        csv_text = df.to_csv(index=False)
-        text = f"Sheet: {sheet_name}\n{csv_text}"
-        meta = dict(base_meta)
-        meta.update({"is_table": True, "is_image": False, "source_page": None, "sheet_name": sheet_name})
-        normalized.append({"text": text, "meta": meta})
-    return normalized
+def _xlsx_sheets(source: Any) -> Iterator[Tuple[str, str]]:
+    """Stream (sheet name, CSV text) pairs from an .xlsx workbook.
+
+    Rows go straight from openpyxl's read-only reader into a CSV writer, so
+    no DataFrame is built and memory stays proportional to one sheet's text.
+    Trailing blank rows are dropped and header-only sheets are skipped, as
+    read_excel + DataFrame.empty did.
+    """
+    import openpyxl
+
+    wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            buf = io.StringIO()
+            writer = csv.writer(buf, lineterminator="\n")
+            filled_rows = 0
+            end = 0
+            for row in ws.iter_rows(values_only=True):
+                writer.writerow(row)
+                if any(value is not None for value in row):
+                    filled_rows += 1
+                    end = buf.tell()
+            if filled_rows < 2:
+                continue
+            yield ws.title, buf.getvalue()[:end]
+    finally:
+        wb.close()
+
+
+def _xls_sheets(source: Any) -> Iterator[Tuple[str, str]]:
+    # Legacy .xls workbooks are not readable by openpyxl; go through pandas.
+    import pandas as pd
+
+    # Open the workbook once and parse sheets one at a time, so only a single
+    # DataFrame is alive at any point instead of the whole book.
+    with pd.ExcelFile(source) as book:
+        for sheet_name in book.sheet_names:
+            df = book.parse(sheet_name)
+            if df.empty:
+                continue
+            yield sheet_name, df.to_csv(index=False, lineterminator="\n")
+
+
+def load_xlsx(path: str, base_meta: Dict[str, Any], *, data: Optional[bytes] = None) -> List[Dict[str, Any]]:
+    # Minimal approach: serialize each sheet to CSV-like text (markdown optional later)
+    source = io.BytesIO(data) if data is not None else path
+    if os.path.splitext(path)[1].lower() == ".xls":
+        sheets = _xls_sheets(source)
+    else:
+        sheets = _xlsx_sheets(source)
+    return [_sheet_element(sheet_name, csv_text, base_meta) for sheet_name, csv_text in sheets]
+
+
+def _sheet_element(sheet_name: str, csv_text: str, base_meta: Dict[str, Any]) -> Dict[str, Any]:
+    return _normalize_element(
+        text=f"Sheet: {sheet_name}\n{csv_text}",
+        base_meta=base_meta,
+        is_table=True,
+        sheet_name=sheet_name,
+    )
 
 
 def load_image(
@@ -271,25 +442,24 @@ def load_image(
         except Exception:
             summary = None
             
-    text = summary if (summary and summary.strip()) else f"Image: {name}"
-    elem = _normalize_element(
-        text=text,
-        base_meta=base_meta,
-        is_table=False,
-        is_image=True,
-        source_page=None,
-    )
-    meta_with_summary = dict(elem["meta"])  # shallow copy
-    meta_with_summary["image_summary"] = text
-    meta_with_summary["image_url"] = str(Path(path))
+    text = summary if not _is_blank(summary) else f"Image: {name}"
+    extra: Dict[str, Any] = {"image_summary": text, "image_url": str(Path(path))}
     # Store base64 encoding if available
     if image_base64:
-        meta_with_summary["image_base64"] = image_base64
+        extra["image_base64"] = image_base64
         print(f"[DEBUG] Added image_base64 to standalone image metadata: {len(image_base64)} chars")
     else:
         print("[DEBUG] No image_base64 to add to standalone image metadata")
-    elem["meta"] = meta_with_summary
-    return [elem]
+    return [
+        _normalize_element(
+            text=text,
+            base_meta=base_meta,
+            is_table=False,
+            is_image=True,
+            source_page=None,
+            **extra,
+        )
+    ]
 
 
 def load_file_to_elements(
@@ -298,24 +468,29 @@ def load_file_to_elements(
     *,
     summarize_image_fn: Optional[Callable[[str], str]] = None,
     summarize_image_with_base64_fn: Optional[Callable[[str], tuple[str, str]]] = None,
-    image_lookup: Optional[Callable[[int], List[str]]] = None,
+    image_lookup: Optional[Callable[[int], Optional[List[str]]]] = None,
+    data: Optional[bytes] = None,
 ) -> List[Dict[str, Any]]:
     """Route a file to the proper loader and return normalized elements.
 
     The returned list items have shape: {"text": str, "meta": dict}
     where meta minimally contains flags: is_table, is_image, source_page, and
     inherits keys from base_meta.
+
+    When ``data`` holds the file contents, documents are parsed from memory and
+    ``path`` only supplies the file name/extension. Images always need a real
+    path since it is stored as their image_url.
     """
 
     dtype = detect_type(path)
     if dtype == "pdf":
-        return load_pdf(path, base_meta, summarize_image_fn=summarize_image_fn, summarize_image_with_base64_fn=summarize_image_with_base64_fn, image_lookup=image_lookup)
+        return load_pdf(path, base_meta, summarize_image_fn=summarize_image_fn, summarize_image_with_base64_fn=summarize_image_with_base64_fn, image_lookup=image_lookup, data=data)
     if dtype == "docx":
-        return load_docx(path, base_meta)
+        return load_docx(path, base_meta, data=data)
     if dtype == "txt":
-        return load_txt(path, base_meta)
+        return load_txt(path, base_meta, data=data)
     if dtype == "xlsx":
-        return load_xlsx(path, base_meta)
+        return load_xlsx(path, base_meta, data=data)
     if dtype == "image":
         return load_image(path, base_meta, summarize_image_fn=summarize_image_fn, summarize_image_with_base64_fn=summarize_image_with_base64_fn)
     raise ValueError(f"Unsupported detected type: {dtype}")
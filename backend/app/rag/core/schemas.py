@@ -2,15 +2,18 @@ from __future__ import annotations
 
 from datetime import datetime
 from typing import List, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class ChunkMeta(BaseModel):
     """Minimal metadata schema aligned with metadata.md and MVP needs.
 
     This is intentionally small for the first phase and can be extended later.
+    Instances are immutable once built by the chunker.
     """
 
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     # Identity / provenance
     chunk_id: str
     source_doc_id: str
@@ -49,6 +52,8 @@ class ChunkMeta(BaseModel):
 class DocumentChunk(BaseModel):
     """A normalized chunk ready for embedding/indexing."""
 
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     text: str
     meta: ChunkMeta
 
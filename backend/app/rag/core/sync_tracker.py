@@ -3,7 +3,7 @@ Module for tracking document synchronization status and history.
 This module provides functions to track and update the sync status of documents.
 """
 
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional
 
 from app.core.database import get_db_session
@@ -24,6 +24,7 @@ def track_document_sync(document_id: str, folder_id: str, status: str = "pending
     Returns:
         The created or updated DocumentSync record
     """
+    now = datetime.now(timezone.utc)
     with get_db_session() as db:
         sync_record = (
             db.query(DocumentSync)
@@ -37,14 +38,14 @@ def track_document_sync(document_id: str, folder_id: str, status: str = "pending
                 folder_id=folder_id,
                 status=status,
                 error_message=error_message,
-                last_synced=datetime.utcnow() if status == "synced" else None
+                last_synced=now if status == "synced" else None
             )
             db.add(sync_record)
         else:
             sync_record.status = status
             sync_record.error_message = error_message
             if status == "synced":
-                sync_record.last_synced = datetime.utcnow()
+                sync_record.last_synced = now
                 sync_record.error_message = None
             
         db.commit()
@@ -1,56 +1,84 @@
 from __future__ import annotations
 
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass
-from typing import Dict, Generator, Iterable, List, Optional, Tuple
+from typing import Any, Dict, Generator, List, Optional, Sequence, Tuple
 from pathlib import Path
 from datetime import datetime
+import asyncio
+import functools
 import io
 import os
 import json
+import random
+import threading
+import time
 import certifi
-import httplib2
 import logging
 
 
 logger = logging.getLogger(__name__)
 
 
-# Configure SSL certificates for Google API calls
-os.environ['SSL_CERT_FILE'] = certifi.where()
-os.environ['REQUESTS_CA_BUNDLE'] = certifi.where()
-os.environ['CURL_CA_BUNDLE'] = certifi.where()
+# Configure SSL certificates for Google API calls. This runs once per process
+# on first import; setdefault leaves explicit user settings alone. The Drive
+# client's httplib2.Http gets certifi's bundle directly in get_drive_service()
+# rather than by patching httplib2.Http.__init__ for every user of httplib2.
+_CA_CERTS = certifi.where()
+for _var in ("SSL_CERT_FILE", "REQUESTS_CA_BUNDLE", "CURL_CA_BUNDLE"):
+    os.environ.setdefault(_var, _CA_CERTS)
 
-# Patch httplib2 to use certifi by default
-def patch_httplib2_ssl():
-    """Patch httplib2 to use certifi certificates by default"""
-    original_init = httplib2.Http.__init__
-    
-    def patched_init(self, cache=None, timeout=None, proxy_info=None, ca_certs=None, 
-                     disable_ssl_certificate_validation=False, tls_maximum_version=None, 
-                     tls_minimum_version=None):
-        # If no ca_certs specified, use certifi
-        if ca_certs is None:
-            ca_certs = certifi.where()
-        return original_init(self, cache=cache, timeout=timeout, proxy_info=proxy_info,
-                           ca_certs=ca_certs, 
-                           disable_ssl_certificate_validation=disable_ssl_certificate_validation,
-                           tls_maximum_version=tls_maximum_version, 
-                           tls_minimum_version=tls_minimum_version)
-    
-    httplib2.Http.__init__ = patched_init
-
-# Apply the patch
-patch_httplib2_ssl()
+try:
+    from ciso8601 import parse_rfc3339 as _parse_rfc3339
+except ImportError:  # optional speedup for large traversals
+    _parse_rfc3339 = datetime.fromisoformat
 
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
+from googleapiclient.errors import HttpError
+from googleapiclient.http import build_http
+from google_auth_httplib2 import AuthorizedHttp, Request as HttplibRequest
 
 
 DEFAULT_SCOPES = ["https://www.googleapis.com/auth/drive.readonly"]
 
+# The file metadata the ingest and sync paths actually read; everything
+# else Drive returns would only add payload to download and parse.
+FILE_FIELDS = "id,name,mimeType,modifiedTime,parents,webViewLink,size"
+LIST_FIELDS = f"nextPageToken, files({FILE_FIELDS})"
+# Traversal lists every file in the tree but most are unchanged and never
+# downloaded, so it leaves out webViewLink; callers fetch it with
+# batch_get_metadata() for the files they keep. md5Checksum lets callers
+# recognise unchanged content without downloading it.
+WALK_FIELDS = "id,name,mimeType,modifiedTime,parents,size,md5Checksum"
+WALK_LIST_FIELDS = f"nextPageToken, files({WALK_FIELDS})"
+
+# Folders listed per files.list call via "'a' in parents or 'b' in parents ...".
+# The best size depends on the tree shape (wide trees favour larger groups,
+# deep narrow ones smaller), so it can be tuned with GDRIVE_LIST_BATCH; it is
+# capped to keep the query well under Drive's length limit.
+MAX_LIST_PARENTS_PER_QUERY = 50
+LIST_PARENTS_PER_QUERY = min(
+    MAX_LIST_PARENTS_PER_QUERY,
+    max(1, int(os.getenv("GDRIVE_LIST_BATCH", str(MAX_LIST_PARENTS_PER_QUERY)))),
+)
+DEFAULT_LIST_CONCURRENCY = 6
+
+# Drive accepts at most 100 calls per multipart/mixed batch request.
+MAX_BATCH_REQUESTS = 100
+
+# Retries for rate-limited (429) and 5xx Drive responses. Single calls use
+# googleapiclient's execute(num_retries=...), which already backs off
+# exponentially with jitter; batch sub-requests and media streams are retried
+# here with the same policy.
+DRIVE_NUM_RETRIES = int(os.getenv("GDRIVE_NUM_RETRIES", "5"))
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+MAX_RETRY_DELAY = 60.0
+
 
-@dataclass
+# Large walks yield tens of thousands of these; slots drop the per-instance
+# __dict__, and nothing mutates a file record after the walk builds it.
+@dataclass(slots=True, frozen=True)
 class DriveFile:
     id: str
     name: str
@@ -58,11 +86,35 @@ class DriveFile:
     modified_time: datetime
     parents: List[str]
     web_view_link: Optional[str]
-    path_segments: List[str]  # logical path from provided root
+    path_segments: Tuple[str, ...]  # logical path from provided root, shared by files in the same folder
+    size: Optional[int] = None  # bytes; Drive omits it for native Google docs
+    md5: Optional[str] = None  # md5Checksum of the content; also absent for native Google docs
+
+
+_thread_local = threading.local()
 
 
 def get_drive_service() -> any:
-    """Create a Google Drive API client using service account credentials.
+    """Return this thread's Google Drive API client, building it on first use.
+
+    The discovery-built service and its httplib2 connection are reused for every
+    call on the same thread; each thread gets its own client because httplib2 is
+    not thread-safe. Credentials are loaded once per process, and the service is
+    built from the discovery document bundled with google-api-python-client, so
+    a cold start makes no discovery HTTP request.
+    """
+    service = getattr(_thread_local, "service", None)
+    if service is None:
+        transport = build_http()
+        transport.ca_certs = _CA_CERTS
+        http = AuthorizedHttp(_load_credentials(), http=transport)
+        service = _thread_local.service = build("drive", "v3", http=http, cache_discovery=False, static_discovery=True)
+    return service
+
+
+@functools.lru_cache(maxsize=1)
+def _load_credentials() -> service_account.Credentials:
+    """Load service account credentials for the Drive API.
 
     Supports two modes:
     1. Local Development: Load from service account JSON file
@@ -92,10 +144,8 @@ def get_drive_service() -> any:
             scopes_env = os.getenv("GOOGLE_DRIVE_SCOPES")
             scopes = [s.strip() for s in scopes_env.split(",")] if scopes_env else DEFAULT_SCOPES
             creds = service_account.Credentials.from_service_account_info(service_account_info, scopes=scopes)
-            logger.info("Successfully created Google Drive service from environment credentials")
-            
-            # Use credentials with proper SSL configuration via environment variables
-            return build("drive", "v3", credentials=creds, cache_discovery=False)
+            logger.info("Successfully loaded Google Drive credentials from environment")
+            return creds
         except json.JSONDecodeError as e:
             raise RuntimeError(f"Invalid JSON in GOOGLE_SERVICE_ACCOUNT_JSON/GOOGLE_APPLICATION_CREDENTIALS_JSON environment variable: {e}")
         except Exception as e:
@@ -129,59 +179,277 @@ def get_drive_service() -> any:
         scopes_env = os.getenv("GOOGLE_DRIVE_SCOPES")
         scopes = [s.strip() for s in scopes_env.split(",")] if scopes_env else DEFAULT_SCOPES
         creds = service_account.Credentials.from_service_account_file(cred_path, scopes=scopes)
-        logger.info("Successfully created Google Drive service from file credentials")
-        
-        # Use credentials with proper SSL configuration via environment variables
-        return build("drive", "v3", credentials=creds, cache_discovery=False)
+        logger.info("Successfully loaded Google Drive credentials from file")
+        return creds
     except Exception as e:
         raise RuntimeError(f"Failed to create credentials from file {cred_path}: {e}")
 
 
-def _list_children(service, folder_id: str) -> List[dict]:
-    q = f"'{folder_id}' in parents and trashed=false"
-    fields = "nextPageToken, files(id, name, mimeType, parents, modifiedTime, webViewLink)"
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+# Server-side filters for _list_children_of_many(kinds=...), so callers that
+# only need one kind of child do not download and parse the other.
+_KIND_FILTERS = {
+    "all": "",
+    "files": f" and mimeType != '{FOLDER_MIME_TYPE}'",
+    "folders": f" and mimeType = '{FOLDER_MIME_TYPE}'",
+}
+
+
+def _list_children_of_many(service, folder_ids: List[str], fields: str = LIST_FIELDS, kinds: str = "all") -> List[dict]:
+    """List the non-trashed children of several folders with one paginated query.
+
+    ``kinds`` is "all", "files" (no folders) or "folders".
+    """
+    parents_q = " or ".join(f"'{folder_id}' in parents" for folder_id in folder_ids)
+    q = f"trashed=false and ({parents_q}){_KIND_FILTERS[kinds]}"
     result: List[dict] = []
-    page_token = None
-    while True:
-        resp = (
-            service.files()
-            .list(q=q, fields=fields, pageSize=1000, pageToken=page_token)
-            .execute()
-        )
+    # list_next derives each page's request from the previous one instead of
+    # rebuilding the files resource and request from discovery metadata.
+    files = service.files()
+    request = files.list(q=q, fields=fields, pageSize=1000)
+    while request is not None:
+        resp = request.execute(num_retries=DRIVE_NUM_RETRIES)
         result.extend(resp.get("files", []))
-        page_token = resp.get("nextPageToken")
-        if not page_token:
-            break
+        request = files.list_next(request, resp)
     return result
 
 
+def parse_drive_time(value: str) -> datetime:
+    """Parse a Drive RFC 3339 timestamp such as ``2024-05-01T12:00:00.000Z``.
+
+    Uses ciso8601's C parser when installed. fromisoformat accepts the
+    trailing "Z" directly on Python 3.11+, so the fallback needs no
+    "+00:00" substitution (and string copy) per file either.
+    """
+    return _parse_rfc3339(value)
+
+
+def _retry_info(error: Exception) -> Tuple[bool, Optional[str]]:
+    """Whether a Drive call failing with ``error`` is worth retrying, and the server's Retry-After."""
+    if isinstance(error, HttpError):
+        return error.resp.status in RETRYABLE_STATUS, error.resp.get("retry-after")
+    response = getattr(error, "response", None)  # httpx.HTTPStatusError
+    status = getattr(response, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS, response.headers.get("Retry-After")
+    return isinstance(error, _transport_errors()), None
+
+
+@functools.lru_cache(maxsize=1)
+def _transport_errors() -> Tuple[type, ...]:
+    """Connection resets and timeouts from httplib2 API calls and httpx downloads."""
+    import httpx
+
+    return (ConnectionError, TimeoutError, httpx.TransportError)
+
+
+def _retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Full-jitter exponential backoff, or the server's Retry-After when it sent one."""
+    if retry_after:
+        try:
+            return min(float(retry_after), MAX_RETRY_DELAY)
+        except ValueError:
+            pass
+    return random.uniform(0, min(MAX_RETRY_DELAY, 2.0 ** attempt))
+
+
+_retry_wait_lock = threading.Lock()
+_retry_wait_total = 0.0
+
+
+def _backoff_sleep(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Sleep before retry ``attempt`` and add the wait to the process-wide total."""
+    global _retry_wait_total
+    delay = _retry_delay(attempt, retry_after)
+    with _retry_wait_lock:
+        _retry_wait_total += delay
+    time.sleep(delay)
+    return delay
+
+
+def retry_wait_seconds() -> float:
+    """Total time this process has spent backing off from Drive errors."""
+    return _retry_wait_total
+
+
+def execute_with_retry(request) -> Any:
+    """Execute a single Drive API request, retrying 429/5xx and dropped connections.
+
+    Unlike ``request.execute(num_retries=...)`` this honours the server's
+    Retry-After header, and its waits count towards retry_wait_seconds().
+    """
+    for attempt in range(DRIVE_NUM_RETRIES + 1):
+        try:
+            return request.execute()
+        except Exception as e:
+            retryable, retry_after = _retry_info(e)
+            if not retryable or attempt == DRIVE_NUM_RETRIES:
+                raise
+            logger.warning("Drive request failed (%s); retrying", e)
+            _backoff_sleep(attempt, retry_after)
+
+
+def execute_batch(service, requests: Dict[str, Any]) -> Dict[str, Tuple[Optional[dict], Optional[Exception]]]:
+    """Run independent Drive API calls as HTTP batch requests.
+
+    ``requests`` maps a caller-chosen id to an unexecuted request such as
+    ``service.files().list(...)``. Up to MAX_BATCH_REQUESTS calls share one
+    round-trip. Calls rejected with 429/5xx are re-sent in a later batch with
+    backoff, up to DRIVE_NUM_RETRIES times. Returns id -> (response,
+    exception); exactly one is None.
+    """
+    results: Dict[str, Tuple[Optional[dict], Optional[Exception]]] = {}
+
+    def _collect(request_id, response, exception):
+        results[request_id] = (response, exception)
+
+    pending = dict(requests)
+    for attempt in range(DRIVE_NUM_RETRIES + 1):
+        items = list(pending.items())
+        for i in range(0, len(items), MAX_BATCH_REQUESTS):
+            batch = service.new_batch_http_request(callback=_collect)
+            for request_id, request in items[i : i + MAX_BATCH_REQUESTS]:
+                batch.add(request, request_id=request_id)
+            batch.execute()
+        if attempt == DRIVE_NUM_RETRIES:
+            break
+        retry_after = None
+        retry = {}
+        for request_id in pending:
+            exception = results[request_id][1]
+            if exception is not None:
+                retryable, after = _retry_info(exception)
+                if retryable:
+                    retry[request_id] = pending[request_id]
+                    retry_after = retry_after or after
+        if not retry:
+            break
+        _backoff_sleep(attempt, retry_after)
+        pending = retry
+    return results
+
+
+def batch_get_metadata(service, file_ids: List[str], fields: str = FILE_FIELDS) -> Dict[str, dict]:
+    """Fetch metadata for many files with batched files.get calls.
+
+    Files that could not be fetched (deleted, no access) are logged and left
+    out of the result.
+    """
+    files = service.files()
+    results = execute_batch(service, {file_id: files.get(fileId=file_id, fields=fields) for file_id in file_ids})
+    metadata: Dict[str, dict] = {}
+    for file_id, (response, exception) in results.items():
+        if exception is not None:
+            logger.warning("Could not fetch metadata for %s: %s", file_id, exception)
+            continue
+        metadata[file_id] = response
+    return metadata
+
+
+def walk_folders(
+    service,
+    root_folder_id: str,
+    max_depth: Optional[int] = None,
+) -> Generator[Tuple[dict, int], None, None]:
+    """Breadth-first traversal yielding (folder, depth) for every folder under root.
+
+    Only folders are requested from Drive, LIST_PARENTS_PER_QUERY parents per
+    query, so building the folder tree skips every file in it. The queries for
+    one level run concurrently (up to GDRIVE_LIST_CONCURRENCY), so a level
+    costs about one round-trip however wide it is. Direct children of the
+    root have depth 1; ``max_depth`` stops the walk below that level.
+    """
+    concurrency = max(1, int(os.getenv("GDRIVE_LIST_CONCURRENCY", str(DEFAULT_LIST_CONCURRENCY))))
+    fields = "nextPageToken, files(id,name,parents)"
+
+    def _list_group(folder_ids: List[str]) -> List[dict]:
+        # Worker threads need their own service; the transport is not thread-safe
+        return list(_list_children_of_many(get_drive_service(), folder_ids, fields, "folders"))
+
+    seen = {root_folder_id}
+    level = [root_folder_id]
+    depth = 1
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while level and (max_depth is None or depth <= max_depth):
+            groups = [level[i : i + LIST_PARENTS_PER_QUERY] for i in range(0, len(level), LIST_PARENTS_PER_QUERY)]
+            if len(groups) == 1 or concurrency == 1:
+                listings = (_list_children_of_many(service, group, fields, "folders") for group in groups)
+            else:
+                listings = pool.map(_list_group, groups)
+            next_level: List[str] = []
+            for listing in listings:
+                for folder in listing:
+                    if folder["id"] in seen:
+                        continue
+                    seen.add(folder["id"])
+                    next_level.append(folder["id"])
+                    yield folder, depth
+            level = next_level
+            depth += 1
+
+
 def walk_from_root(
     service,
     root_folder_id: str,
 ) -> Generator[DriveFile, None, None]:
-    """Depth-first traversal yielding files (not folders) with logical path segments.
+    """Traverse the tree under root_folder_id, yielding files (not folders) with logical path segments.
 
     The path is constructed from the root down to the file's immediate folder chain.
+    Yielded files have no web_view_link (see WALK_FIELDS).
+    Pending folders are listed LIST_PARENTS_PER_QUERY at a time, with up to
+    GDRIVE_LIST_CONCURRENCY (default 6) queries in flight. A folder's children
+    are queued as soon as its query returns rather than after the whole tree
+    level, so one slow listing does not stall the rest of the walk. Worker
+    threads each use their own Drive service since the httplib2 transport is
+    not thread-safe.
     """
-    stack: List[Tuple[str, List[str]]] = [(root_folder_id, [])]
-    while stack:
-        folder_id, segments = stack.pop()
-        children = _list_children(service, folder_id)
-        for item in children:
-            mime = item.get("mimeType")
-            if mime == "application/vnd.google-apps.folder":
-                stack.append((item["id"], segments + [item["name"]]))
-                continue
-            # file
-            yield DriveFile(
-                id=item["id"],
-                name=item["name"],
-                mime_type=mime,
-                modified_time=datetime.fromisoformat(item["modifiedTime"].replace("Z", "+00:00")),
-                parents=item.get("parents", []),
-                web_view_link=item.get("webViewLink"),
-                path_segments=segments,
-            )
+    concurrency = max(1, int(os.getenv("GDRIVE_LIST_CONCURRENCY", str(DEFAULT_LIST_CONCURRENCY))))
+
+    def _list_group(folder_ids: List[str]) -> List[dict]:
+        # With a single worker the caller's service is never used concurrently
+        return _list_children_of_many(service if concurrency == 1 else get_drive_service(), folder_ids, WALK_LIST_FIELDS)
+
+    # Immutable, so every file in a folder can share its folder's tuple
+    folder_paths: Dict[str, Tuple[str, ...]] = {root_folder_id: ()}
+    ready: List[str] = [root_folder_id]
+    in_flight: Dict[Future, List[str]] = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while ready or in_flight:
+            # Keep the pool busy; a partial group is only sent when nothing is in
+            # flight, otherwise it waits to be filled by the next results.
+            while ready and len(in_flight) < concurrency:
+                if len(ready) < LIST_PARENTS_PER_QUERY and in_flight:
+                    break
+                group = ready[:LIST_PARENTS_PER_QUERY]
+                del ready[:LIST_PARENTS_PER_QUERY]
+                in_flight[pool.submit(_list_group, group)] = group
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                group = in_flight.pop(future)
+                group_ids = set(group)
+                for item in future.result():
+                    # Map the item back to the queried folder it was listed under
+                    parent_id = next((p for p in item.get("parents", []) if p in group_ids), group[0])
+                    segments = folder_paths[parent_id]
+                    mime = item.get("mimeType")
+                    if mime == FOLDER_MIME_TYPE:
+                        if item["id"] not in folder_paths:
+                            folder_paths[item["id"]] = (*segments, item["name"])
+                            ready.append(item["id"])
+                        continue
+                    # file
+                    yield DriveFile(
+                        id=item["id"],
+                        name=item["name"],
+                        mime_type=mime,
+                        modified_time=parse_drive_time(item["modifiedTime"]),
+                        parents=item.get("parents", []),
+                        web_view_link=item.get("webViewLink"),
+                        path_segments=segments,
+                        size=int(item["size"]) if "size" in item else None,
+                        md5=item.get("md5Checksum"),
+                    )
 
 
 SUPPORTED_MIME_PREFIXES = ("image/",)
@@ -193,44 +461,167 @@ SUPPORTED_MIME_EXACT = {
 }
 
 
+SUPPORTED_IMAGE_EXTS = frozenset({".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp"})
+_SUPPORTED_IMAGE_SUFFIXES = tuple(SUPPORTED_IMAGE_EXTS)
+
+
 def resolve_type_from_mime(name: str, mime_type: str) -> Optional[str]:
-    if mime_type in SUPPORTED_MIME_EXACT:
-        return SUPPORTED_MIME_EXACT[mime_type]
-    if any(mime_type.startswith(p) for p in SUPPORTED_MIME_PREFIXES):
-        # validate by extension to be safe
-        ext = Path(name).suffix.lower()
-        if ext in {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp"}:
-            return "image"
+    # File names are nearly unique, so memoizing on (name, mime) would only
+    # grow a cache; both checks below are single C-level calls instead.
+    dtype = SUPPORTED_MIME_EXACT.get(mime_type)
+    if dtype is not None:
+        return dtype
+    # validate by extension to be safe; only reached for image MIME types
+    if mime_type.startswith(SUPPORTED_MIME_PREFIXES) and name.lower().endswith(_SUPPORTED_IMAGE_SUFFIXES):
+        return "image"
     return None
 
 
-def download_file(service, file_id: str, dest_path: Path) -> None:
+# One process-wide HTTP/2 client shared by all download threads, so
+# concurrent media GETs are multiplexed over a single TLS connection instead
+# of each thread opening its own. httpx.Client is thread-safe; the bearer
+# token is refreshed under a lock.
+MEDIA_MAX_CONNECTIONS = int(os.getenv("GDRIVE_MEDIA_MAX_CONNECTIONS", "32"))
+_media_lock = threading.Lock()
+_media_client = None
+
+
+def _get_media_client():
+    """The shared HTTP/2 httpx client, built on first use."""
+    global _media_client
+    if _media_client is not None:
+        return _media_client
+    with _media_lock:
+        if _media_client is None:
+            import httpx
+
+            _media_client = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_connections=MEDIA_MAX_CONNECTIONS),
+                timeout=httpx.Timeout(300.0, connect=30.0),
+                verify=_CA_CERTS,
+            )
+    return _media_client
+
+
+def _media_auth_header(req) -> Dict[str, str]:
+    """Authorization header for a media request, from its service's credentials.
+
+    The token comes from the same credentials the calling thread's
+    AuthorizedHttp uses, refreshed (when expired) over that thread's own
+    httplib2 transport; download threads refresh one at a time under the lock.
+    """
+    authed_http = req.http
+    headers: Dict[str, str] = {}
+    with _media_lock:
+        authed_http.credentials.before_request(HttplibRequest(authed_http.http), "GET", req.uri, headers)
+    return headers
+
+
+def _stream_media(service, file_id: str, fh) -> None:
+    """Write a file's content to fh.
+
+    The alt=media GET goes over the shared HTTP/2 client and is consumed as
+    one streamed response instead of MediaIoBaseDownload's ranged request per
+    chunk.
+
+    Rate-limited (429), 5xx and dropped-connection attempts are retried with
+    backoff; only the calling download thread sleeps, and fh is rewound so a
+    partial body is not kept.
+    """
     req = service.files().get_media(fileId=file_id)
-    with io.FileIO(dest_path, "wb") as fh:
-        downloader = MediaIoBaseDownload(fh, req)
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
-            # Optional: print(f"Download {int(status.progress() * 100)}%")
+    for attempt in range(DRIVE_NUM_RETRIES + 1):
+        try:
+            _stream_media_once(req, fh)
+            return
+        except Exception as e:
+            retryable, retry_after = _retry_info(e)
+            if not retryable or attempt == DRIVE_NUM_RETRIES:
+                raise
+            logger.warning("Download of %s failed (%s); retrying", file_id, e)
+            _backoff_sleep(attempt, retry_after)
+            fh.seek(0)
+            fh.truncate()
+
+
+def _stream_media_once(req, fh) -> None:
+    with _get_media_client().stream("GET", req.uri, headers=_media_auth_header(req)) as resp:
+        resp.raise_for_status()
+        # Write each chunk as it comes off the connection; a chunk_size would
+        # re-buffer the body through httpx's ByteChunker first
+        for chunk in resp.iter_bytes():
+            fh.write(chunk)
+
+
+DEFAULT_ASYNC_DOWNLOADS = 8
+
+
+async def download_files_async(
+    downloads: Dict[str, Path],
+    concurrency: int = DEFAULT_ASYNC_DOWNLOADS,
+) -> Dict[str, Optional[Exception]]:
+    """Download several files concurrently from async code.
+
+    ``downloads`` maps file id -> destination path. Each file goes through
+    download_file() on a worker thread, at most ``concurrency`` at a time, so
+    it gets the same 429/5xx retries and shared HTTP/2 client as the sync
+    path and no socket read or disk write runs on the event loop. Returns
+    file id -> exception, or None on success.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    def _download_sync(file_id: str, dest: Path) -> None:
+        download_file(get_drive_service(), file_id, dest)
+
+    async def _download(file_id: str, dest: Path) -> Tuple[str, Optional[Exception]]:
+        async with semaphore:
+            try:
+                await asyncio.to_thread(_download_sync, file_id, dest)
+            except Exception as e:
+                return file_id, e
+            return file_id, None
+
+    results = await asyncio.gather(*(_download(file_id, dest) for file_id, dest in downloads.items()))
+    return dict(results)
+
+
+def download_file(service, file_id: str, dest_path: Path) -> None:
+    with io.FileIO(dest_path, "wb") as fh:  # unbuffered: chunks go straight to disk
+        _stream_media(service, file_id, fh)
 
 
-def classify_from_path(path_segments: List[str]) -> tuple[bool, Optional[str], List[str]]:
+def download_file_to_buffer(service, file_id: str) -> bytes:
+    """Download a file into memory, for callers that parse it without staging on disk."""
+    buf = io.BytesIO()
+    _stream_media(service, file_id, buf)
+    return buf.getvalue()
+
+
+_ROLES_PI = ("pi",)
+_ROLES_NON_PI = ("non_pi",)
+# Only the first three segments (root, PI/NON PI, uid) affect the result and
+# every file under a folder shares them, so classifications are memoized.
+_CLASSIFY_CACHE: Dict[Tuple[str, ...], Tuple[bool, Optional[str], Tuple[str, ...]]] = {}
+
+
+def classify_from_path(path_segments: Sequence[str]) -> tuple[bool, Optional[str], Tuple[str, ...]]:
     """Return (is_pi, uid, roles_allowed) based on path per Instructions.md.
 
     Expected structure under root: EVIDEV_DATA/{PI|NON PI}/...
-    If under PI/<uid>/..., mark PI with uid; Otherwise NON PI.
+    If under PI/<uid>/..., mark PI with uid; Otherwise NON PI. A file directly
+    in the PI folder (no uid segment) is still PI, with uid None, so it never
+    falls through to the non-PI roles.
+    roles_allowed is a shared tuple; callers must not mutate it.
     """
-    is_pi = False
-    uid: Optional[str] = None
-    roles = ["non_pi"]
-    if not path_segments:
-        return is_pi, uid, roles
-    first = path_segments[1].strip().lower()
-    if first == "pi" and len(path_segments) >= 2:
-        is_pi = True
-        uid = path_segments[2]
-        roles = ["pi"]
-    logger.info(f"Documents details ------{path_segments}!!!!!{is_pi}@@@@@{uid}####{roles}")
-    
-    return is_pi, uid, roles
+    key = tuple(path_segments[:3])
+    cached = _CLASSIFY_CACHE.get(key)
+    if cached is not None:
+        return cached
+    if len(key) >= 2 and key[1].strip().lower() == "pi":
+        result = (True, key[2] if len(key) == 3 else None, _ROLES_PI)
+    else:
+        result = (False, None, _ROLES_NON_PI)
+    _CLASSIFY_CACHE[key] = result
+    logger.debug("Classified %s: is_pi=%s uid=%s roles=%s", key, *result)
+    return result
 
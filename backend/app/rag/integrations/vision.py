@@ -13,7 +13,10 @@ Notes:
 
 import os
 import base64
-from typing import Optional
+import hashlib
+import mmap
+import threading
+from collections import OrderedDict
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -21,12 +24,18 @@ from pathlib import Path
 env_path = Path(__file__).parent.parent.parent.parent.parent / 'config' / '.env'
 load_dotenv(dotenv_path=env_path)
 
-try:
-    from openai import OpenAI
-except ImportError as _e:
-    OpenAI = None  # type: ignore
+# The openai client is imported on first use so that importing this module
+# (done eagerly by ingest and the sync service) stays cheap.
+_client = None
 
-_client: Optional[OpenAI] = None
+# LRU of summaries keyed by a BLAKE2b digest of the image bytes, so images
+# repeated across pages/documents (logos, headers) are only sent to the model
+# once. Bounded because the sync service keeps this module loaded for the
+# life of the process; images are summarized on worker threads.
+DEFAULT_SUMMARY_CACHE_SIZE = 4096
+_summary_cache_size = int(os.getenv("VISION_SUMMARY_CACHE_SIZE", str(DEFAULT_SUMMARY_CACHE_SIZE)))
+_summary_cache: OrderedDict[str, str] = OrderedDict()
+_summary_cache_lock = threading.Lock()
 
 
 def _get_client():
@@ -34,43 +43,59 @@ def _get_client():
     if _client is not None:
         return _client
     
-    if OpenAI is None:
-        raise RuntimeError("openai library is not available; please install it.")
+    try:
+        from openai import OpenAI
+    except ImportError as e:
+        raise RuntimeError("openai library is not available; please install it.") from e
     
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY environment variable is required.")
     
-    _client = OpenAI(api_key=api_key)
+    # Images are summarized concurrently, so 429s are expected under load; the
+    # client retries them with exponential backoff.
+    _client = OpenAI(api_key=api_key, max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "5")))
     return _client
 
 
+# The model and prompt are the same for every image
+VISION_MODEL = "gpt-4o-mini-2024-07-18"
+VISION_PROMPT = "You are an analyst. Examine the chart or image and, in no more than 4 sentences, concisely describe the key trends, axes (including units, scales, and categories), and all notable features (if any), including subtle or distinct details that may be easily overlooked. Focus on insights and patterns rather than restating obvious labels, and ensure every sentence adds unique, non-redundant information."
+_PROMPT_PART = {"type": "text", "text": VISION_PROMPT}
+
+
 def _encode_image(image_path: str) -> str:
-    """Encode image to base64 string"""
+    """Encode image to base64 string.
+
+    The file is memory-mapped and encoded from the mapping, so large images
+    are not first copied into a bytes object.
+    """
     with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode('utf-8')
+        if os.fstat(image_file.fileno()).st_size == 0:
+            return ""  # mmap cannot map an empty file
+        with mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return base64.b64encode(mapped).decode('ascii')
 
 
-def summarize_image_llava(image_path: str) -> str:
-    """Return a concise description/summary for graphs or images using GPT-4o-mini.
+def _image_cache_key(base64_image: str) -> str:
+    return hashlib.blake2b(base64_image.encode("ascii"), digest_size=16).hexdigest()
 
-    Keep the output short and informative for indexing.
-    """
-    client = _get_client()
-    
-    # Encode image to base64
-    base64_image = _encode_image(image_path)
-    
-    response = client.chat.completions.create(
-        model="gpt-4o-mini-2024-07-18",
+
+def summarize_image_from_base64(base64_image: str) -> str:
+    """Summarize an image the caller has already base64-encoded, reusing cached summaries."""
+    cache_key = _image_cache_key(base64_image)
+    with _summary_cache_lock:
+        if cache_key in _summary_cache:
+            _summary_cache.move_to_end(cache_key)
+            return _summary_cache[cache_key]
+
+    response = _get_client().chat.completions.create(
+        model=VISION_MODEL,
         messages=[
             {
                 "role": "user",
                 "content": [
-                    {
-                        "type": "text",
-                        "text": "You are an analyst. Examine the chart or image and, in no more than 4 sentences, concisely describe the key trends, axes (including units, scales, and categories), and all notable features (if any), including subtle or distinct details that may be easily overlooked. Focus on insights and patterns rather than restating obvious labels, and ensure every sentence adds unique, non-redundant information."
-                    },
+                    _PROMPT_PART,
                     {
                         "type": "image_url",
                         "image_url": {
@@ -83,7 +108,20 @@ def summarize_image_llava(image_path: str) -> str:
         max_tokens=150
     )
     
-    return response.choices[0].message.content.strip() if response.choices[0].message.content else ""
+    summary = response.choices[0].message.content.strip() if response.choices[0].message.content else ""
+    with _summary_cache_lock:
+        _summary_cache[cache_key] = summary
+        while len(_summary_cache) > _summary_cache_size:
+            _summary_cache.popitem(last=False)
+    return summary
+
+
+def summarize_image_llava(image_path: str) -> str:
+    """Return a concise description/summary for graphs or images using GPT-4o-mini.
+
+    Keep the output short and informative for indexing.
+    """
+    return summarize_image_from_base64(_encode_image(image_path))
 
 
 def summarize_image_with_base64(image_path: str) -> tuple[str, str]:
@@ -92,34 +130,5 @@ def summarize_image_with_base64(image_path: str) -> tuple[str, str]:
     Returns:
         tuple: (summary, base64_encoding)
     """
-    client = _get_client()
-    
-    # Encode image to base64
     base64_image = _encode_image(image_path)
-    
-    response = client.chat.completions.create(
-        model="gpt-4o-mini-2024-07-18",
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": "You are an analyst. Examine the chart or image and, in no more than 4 sentences, concisely describe the key trends, axes (including units, scales, and categories), and all notable features (if any), including subtle or distinct details that may be easily overlooked. Focus on insights and patterns rather than restating obvious labels, and ensure every sentence adds unique, non-redundant information."
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}"
-                        }
-                    }
-                ]
-            }
-        ],
-        max_tokens=150
-    )
-    
-    summary = response.choices[0].message.content.strip() if response.choices[0].message.content else ""
-    return summary, base64_image
-
-
+    return summarize_image_from_base64(base64_image), base64_image
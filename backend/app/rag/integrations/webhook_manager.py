@@ -8,16 +8,16 @@ for automatic document synchronization.
 
 import os
 import sys
-import json
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Dict, Optional, List, Tuple
 
 # Add the backend directory to the Python path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
-from app.rag.integrations.drive import get_drive_service
-from app.services.sync_service import setup_drive_webhook
+from app.rag.integrations.drive import execute_with_retry, get_drive_service, retry_wait_seconds, walk_folders
+from app.services.sync_service import setup_drive_webhook, setup_drive_webhooks
+from app.rag.storage import webhook_channel_log
 
 
 def list_active_channels():
@@ -55,20 +55,22 @@ def setup_webhook_for_folder(webhook_url: str, folder_id: str, description: str
         return None
 
 
+# Channel records are appended to a JSON Lines log next to
+# webhook_channels.json (see app.rag.storage.webhook_channel_log), so saving
+# or updating a channel writes only that record instead of rewriting the whole
+# file. Channels saved by older versions to the JSON array are still read;
+# the array itself is never rewritten or moved.
+CHANNELS_FILE = Path("webhook_channels.json")
+CHANNELS_LOG = webhook_channel_log.log_path(CHANNELS_FILE)
+
+
+def load_channels() -> Dict[str, dict]:
+    """Fold the saved channels into channel_id -> current record."""
+    return webhook_channel_log.load_channels(CHANNELS_FILE)
+
+
 def save_channel_info(channel_info: dict, folder_id: str, webhook_url: str, description: str):
-    """Save channel information to a local file"""
-    channels_file = Path("webhook_channels.json")
-    
-    # Load existing channels
-    channels = []
-    if channels_file.exists():
-        try:
-            with open(channels_file, 'r') as f:
-                channels = json.load(f)
-        except Exception as e:
-            print(f"Warning: Could not load existing channels: {e}")
-    
-    # Add new channel
+    """Save channel information to the local channel log"""
     channel_record = {
         "channel_id": channel_info.get('id'),
         "resource_id": channel_info.get('resourceId'),
@@ -80,13 +82,9 @@ def save_channel_info(channel_info: dict, folder_id: str, webhook_url: str, desc
         "status": "active"
     }
     
-    channels.append(channel_record)
-    
-    # Save updated channels
     try:
-        with open(channels_file, 'w') as f:
-            json.dump(channels, f, indent=2)
-        print(f"💾 Channel info saved to {channels_file}")
+        webhook_channel_log.append_record(CHANNELS_FILE, channel_record)
+        print(f"💾 Channel info saved to {CHANNELS_LOG}")
     except Exception as e:
         print(f"Warning: Could not save channel info: {e}")
 
@@ -99,54 +97,49 @@ def stop_webhook_channel(channel_id: str):
         service = get_drive_service()
         
         # Stop the channel
-        service.channels().stop(body={'id': channel_id}).execute()
+        execute_with_retry(service.channels().stop(body={'id': channel_id}))
         
         print("✅ Channel stopped successfully!")
         
         # Update local records
         update_channel_status(channel_id, "stopped")
+        _compact_channel_log()
         
     except Exception as e:
         print(f"❌ Failed to stop channel: {e}")
 
 
+def _compact_channel_log():
+    """Rewrite the channel log after writes once status updates have piled up."""
+    try:
+        if webhook_channel_log.compact_if_needed(CHANNELS_FILE):
+            print(f"🗜️  Compacted {CHANNELS_LOG}")
+    except Exception as e:
+        print(f"Warning: Could not compact channel log: {e}")
+
+
 def update_channel_status(channel_id: str, status: str):
     """Update channel status in local records"""
-    channels_file = Path("webhook_channels.json")
-    
-    if not channels_file.exists():
-        return
-    
     try:
-        with open(channels_file, 'r') as f:
-            channels = json.load(f)
-        
-        # Update channel status
-        for channel in channels:
-            if channel.get('channel_id') == channel_id:
-                channel['status'] = status
-                channel['updated_at'] = datetime.now().isoformat()
-                break
-        
-        # Save updated channels
-        with open(channels_file, 'w') as f:
-            json.dump(channels, f, indent=2)
-            
+        webhook_channel_log.append_record(CHANNELS_FILE, {
+            "op": "update",
+            "channel_id": channel_id,
+            "status": status,
+            "updated_at": datetime.now().isoformat(),
+        })
     except Exception as e:
         print(f"Warning: Could not update channel status: {e}")
 
 
 def show_saved_channels():
     """Show saved channel information"""
-    channels_file = Path("webhook_channels.json")
-    
-    if not channels_file.exists():
+    if not webhook_channel_log.channels_exist(CHANNELS_FILE):
         print("📋 No saved webhook channels found.")
         return
     
     try:
-        with open(channels_file, 'r') as f:
-            channels = json.load(f)
+        # Read-only: compaction happens after writes (stop, bulk setup)
+        channels = list(load_channels().values())
         
         print("📋 Saved Webhook Channels\n")
         
@@ -236,6 +229,25 @@ def main():
             print(f"❌ Error: {e}")
 
 
+def setup_webhooks_for_folders(webhook_url: str, folders: List[Tuple[str, str]]) -> int:
+    """Set up webhooks for (folder_id, description) pairs with batched watch calls.
+
+    Returns the number of webhooks created.
+    """
+    results = setup_drive_webhooks(webhook_url, [folder_id for folder_id, _ in folders])
+    success_count = 0
+    for folder_id, description in folders:
+        channel_info, error = results[folder_id]
+        if error is not None:
+            print(f"   ❌ Failed to set up webhook for {description}: {error}")
+            continue
+        print(f"   ✅ {description}: channel {channel_info.get('id')}")
+        save_channel_info(channel_info, folder_id, webhook_url, description)
+        success_count += 1
+    _compact_channel_log()
+    return success_count
+
+
 def setup_webhooks_for_subfolders(webhook_url: str, root_folder_id: str):
     """Set up webhooks for all subfolders in the root folder"""
     print(f"🔗 Setting up webhooks for all subfolders in: {root_folder_id}")
@@ -243,66 +255,60 @@ def setup_webhooks_for_subfolders(webhook_url: str, root_folder_id: str):
     try:
         service = get_drive_service()
         
-        # Get all folders in the root directory
-        query = f"'{root_folder_id}' in parents and mimeType = 'application/vnd.google-apps.folder' and trashed = false"
-        results = service.files().list(
-            q=query,
-            fields='files(id,name)',
-            pageSize=50
-        ).execute()
+        # One two-level walk finds the root's folders and the PI folder's
+        # subfolders; each level's listings run concurrently.
+        top_level: List[dict] = []
+        second_level: List[dict] = []
+        for folder, depth in walk_folders(service, root_folder_id, max_depth=2):
+            (top_level if depth == 1 else second_level).append(folder)
+        print(f"Found {len(top_level)} subfolders to set up webhooks for")
         
-        folders = results.get('files', [])
-        print(f"Found {len(folders)} subfolders to set up webhooks for")
-        
-        success_count = 0
-        for folder in folders:
-            try:
-                folder_id = folder['id']
-                folder_name = folder['name']
-                print(f"\n📁 Setting up webhook for: {folder_name}")
-                
-                setup_webhook_for_folder(webhook_url, folder_id, f"Subfolder: {folder_name}")
-                success_count += 1
-                
-                # If this is the PI folder, also set up webhooks for its subfolders
-                if folder_name.upper() == 'PI':
-                    print(f"   📂 Setting up webhooks for PI subfolders...")
-                    setup_webhooks_recursively(service, webhook_url, folder_id, f"{folder_name}/")
-                    
-            except Exception as e:
-                print(f"   ❌ Failed to set up webhook for {folder.get('name', 'unknown')}: {e}")
+        targets = [(folder['id'], f"Subfolder: {folder['name']}") for folder in top_level]
+        # The PI folder's subfolders get webhooks too
+        pi_folders = {folder['id']: folder['name'] for folder in top_level if folder['name'].upper() == 'PI'}
+        if pi_folders:
+            print("   📂 Including PI subfolders...")
+        for folder in second_level:
+            parent_id = next((p for p in folder.get('parents', []) if p in pi_folders), None)
+            if parent_id is not None:
+                targets.append((folder['id'], f"Subfolder: {pi_folders[parent_id]}/{folder['name']}"))
         
-        print(f"\n✅ Successfully set up webhooks for {success_count}/{len(folders)} subfolders")
+        # The watch calls go out as batched requests (up to 100 per round-trip)
+        success_count = setup_webhooks_for_folders(webhook_url, targets)
+        print(f"\n✅ Successfully set up webhooks for {success_count}/{len(targets)} folders")
+        waited = retry_wait_seconds()
+        if waited:
+            print(f"   ⏳ Spent {waited:.1f}s backing off from Drive rate limits/errors")
         
     except Exception as e:
         print(f"❌ Error setting up subfolder webhooks: {e}")
 
 
-def setup_webhooks_recursively(service, webhook_url: str, parent_folder_id: str, path_prefix: str = ""):
-    """Recursively set up webhooks for subfolders"""
+def _subfolder_targets(
+    service, parent_folder_id: str, path_prefix: str, max_depth: Optional[int] = 1
+) -> List[Tuple[str, str]]:
+    """(folder_id, description) for the subfolders of a folder, down to max_depth levels.
+
+    walk_folders lists the tree level by level with OR'd parent queries, so
+    there is no recursion and no per-folder round-trip.
+    """
+    prefixes = {parent_folder_id: path_prefix}
+    targets: List[Tuple[str, str]] = []
+    for folder, _ in walk_folders(service, parent_folder_id, max_depth=max_depth):
+        parent_id = next((p for p in folder.get('parents', []) if p in prefixes), parent_folder_id)
+        folder_path = f"{prefixes[parent_id]}{folder['name']}"
+        prefixes[folder['id']] = f"{folder_path}/"
+        targets.append((folder['id'], f"Subfolder: {folder_path}"))
+    print(f"     Found {len(targets)} subfolders in {path_prefix}")
+    return targets
+
+
+def setup_webhooks_recursively(
+    service, webhook_url: str, parent_folder_id: str, path_prefix: str = "", max_depth: Optional[int] = 1
+):
+    """Set up webhooks for the subfolders of a folder; max_depth=None covers the whole tree"""
     try:
-        query = f"'{parent_folder_id}' in parents and mimeType = 'application/vnd.google-apps.folder' and trashed = false"
-        results = service.files().list(
-            q=query,
-            fields='files(id,name)',
-            pageSize=50
-        ).execute()
-        
-        folders = results.get('files', [])
-        print(f"     Found {len(folders)} subfolders in {path_prefix}")
-        
-        for folder in folders:
-            try:
-                folder_id = folder['id']
-                folder_name = folder['name']
-                folder_path = f"{path_prefix}{folder_name}"
-                
-                print(f"     📁 Setting up webhook for: {folder_path}")
-                setup_webhook_for_folder(webhook_url, folder_id, f"Subfolder: {folder_path}")
-                
-            except Exception as e:
-                print(f"     ❌ Failed to set up webhook for {folder_path}: {e}")
-                
+        setup_webhooks_for_folders(webhook_url, _subfolder_targets(service, parent_folder_id, path_prefix, max_depth))
     except Exception as e:
         print(f"     ❌ Error in recursive setup: {e}")
 
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
 import os
+import hashlib
 import mimetypes
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass
 from datetime import datetime, UTC
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 import sys
 from pathlib import Path
 
@@ -15,10 +19,14 @@ sys.path.insert(0, str(backend_root))
 from app.rag.core.schemas import DocumentChunk, ChunkMeta
 from app.rag.core.loaders import load_file_to_elements
 from app.rag.core.chunking import chunk_elements
-from app.rag.storage.index_qdrant import upsert_document_chunks
-from app.rag.integrations.drive import get_drive_service, walk_from_root, download_file, resolve_type_from_mime, classify_from_path
+from app.rag.core.embed import get_embedding_client
+from app.rag.config.config import Config
+from app.rag.storage.index_qdrant import ensure_collection, get_client, upsert_document_chunks
+from app.rag.integrations.drive import get_drive_service, walk_from_root, batch_get_metadata, download_file, download_file_to_buffer, resolve_type_from_mime, classify_from_path
 from app.rag.core.extractors import extract_pdf_images, extract_docx_images
-from app.rag.storage.sync_tracker import track_document_sync, mark_document_synced, mark_document_failed, document_needs_resync
+from app.rag.storage.ingest_manifest import IngestManifest
+from app.rag.storage.parse_cache import ParseCache
+from app.rag.storage.sync_tracker import track_documents_sync, mark_document_synced, mark_document_failed, documents_needing_resync, get_sync_db
 
 try:
     from app.rag.integrations.vision import summarize_image_llava, summarize_image_with_base64
@@ -29,11 +37,22 @@ except Exception as e:
     summarize_image_with_base64 = None  # type: ignore
 
 
-def build_base_meta(path: Path, *, is_pi: bool = False, uid: str | None = None) -> Dict[str, Any]:
+def build_base_meta(
+    path: Path,
+    *,
+    is_pi: bool = False,
+    uid: str | None = None,
+    st: os.stat_result | None = None,
+    ingested_at: datetime | None = None,
+) -> Dict[str, Any]:
     """Construct minimal base metadata for the file.
 
     In real usage, these come from Google Drive. Here we infer from path for MVP.
+    Pass ``st`` when the file was already stat'ed to avoid another syscall, and
+    ``ingested_at`` to share one run timestamp across files.
     """
+    if st is None:
+        st = path.stat()
     source_doc_type = _ext_to_type(path.suffix.lower())
     mime_type, _ = mimetypes.guess_type(str(path))
     return {
@@ -47,24 +66,264 @@ def build_base_meta(path: Path, *, is_pi: bool = False, uid: str | None = None)
         "roles_allowed": ["pi"] if is_pi else ["non_pi"],
         "is_pi": is_pi,
         "folder_path": str(path.parent),
-        "source_last_modified_at": datetime.fromtimestamp(path.stat().st_mtime, tz=UTC),
-        "ingested_at": datetime.now(UTC),
+        "source_last_modified_at": datetime.fromtimestamp(st.st_mtime, tz=UTC),
+        "ingested_at": ingested_at or datetime.now(UTC),
         "language": "en",
     }
 
 
+_EXT_TYPE = {
+    ".pdf": "pdf",
+    ".docx": "docx",
+    ".txt": "txt",
+    ".log": "txt",
+    ".xlsx": "xlsx",
+    ".xls": "xlsx",
+    **{ext: "image" for ext in (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp")},
+}
+
+
 def _ext_to_type(ext: str) -> str:
-    if ext == ".pdf":
-        return "pdf"
-    if ext == ".docx":
-        return "docx"
-    if ext in {".txt", ".log"}:
-        return "txt"
-    if ext in {".xlsx", ".xls"}:
-        return "xlsx"
-    if ext in {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp"}:
-        return "image"
-    return ext.strip(".")
+    return _EXT_TYPE.get(ext) or ext.strip(".")
+
+
+def _iter_files(root: str | os.PathLike[str]) -> Iterator[Tuple[Path, os.stat_result]]:
+    """Yield (path, stat) for regular files under root, depth-first in name order.
+
+    os.scandir gets the file type from the directory listing, so each file is
+    stat'ed once; sorting per directory keeps the order deterministic without
+    materializing the whole tree.
+    """
+    with os.scandir(root) as it:
+        entries = sorted(it, key=lambda e: e.name)
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from _iter_files(entry.path)
+        elif entry.is_file():
+            yield Path(entry.path), entry.stat()
+
+
+@dataclass
+class _SourceFile:
+    """A file from either ingest source, ready to be parsed and chunked."""
+
+    path: Path  # on disk, or only naming the file when ``data`` holds its contents
+    dtype: str
+    base_meta: Dict[str, Any]
+    data: Optional[bytes] = None
+    digest: Optional[bytes] = None  # content hash; duplicate uploads are parsed once
+    image_job: Optional[Future] = None  # pending extract_pdf_images/extract_docx_images result
+    stat: Optional[os.stat_result] = None  # local files only, recorded in the manifest
+    cache_key: Optional[str] = None  # Drive content key the parse cache stores elements under
+    cached: Optional[List[Dict[str, Any]]] = None  # elements reused from the parse cache; not downloaded
+
+
+def _drive_base_meta(f, dtype: str, web_view_link: Optional[str], ingested_at: Optional[datetime] = None) -> Dict[str, Any]:
+    # Classify PI/NON PI from logical path
+    is_pi, uid, roles = classify_from_path(f.path_segments)
+    return {
+        "source_doc_id": f.id,
+        "source_doc_name": f.name,
+        "source_doc_type": dtype,
+        "source_doc_url": web_view_link,
+        "doc_mime_type": f.mime_type,
+        "owner_uid": uid,
+        "uid": uid,
+        "roles_allowed": roles,
+        "is_pi": is_pi,
+        "folder_path": "/".join(f.path_segments),
+        "source_last_modified_at": f.modified_time,
+        "ingested_at": ingested_at or datetime.now(UTC),
+        "language": "en",
+    }
+
+
+def _submit_image_job(cpu_pool: ProcessPoolExecutor, dtype: str, path: Path, image_dir: Path, data: Optional[bytes] = None) -> Optional[Future]:
+    """Start image extraction for PDFs and DOCX in the process pool."""
+    if dtype == "pdf":
+        return cpu_pool.submit(extract_pdf_images, str(path), str(image_dir), data=data, parallel=False)
+    if dtype == "docx":
+        return cpu_pool.submit(extract_docx_images, str(path), str(image_dir), data=data)
+    return None
+
+
+def _parse_source_file(
+    path: str,
+    base_meta: Dict[str, Any],
+    dtype: str,
+    images: Optional[Dict[int, List[str]]],
+    data: Optional[bytes],
+    summarize_fn,
+    summarize_with_base64_fn,
+) -> List[Dict[str, Any]]:
+    """Process-pool entry point: parse one file into normalized elements."""
+    image_lookup = None
+    # DOCX images are only written out; load_docx takes no lookup
+    if dtype == "pdf" and images is not None:
+        # page_number -> image paths; a missing page yields None,
+        # which the loaders treat like an empty list
+        image_lookup = images.get
+    return load_file_to_elements(path, base_meta, summarize_image_fn=summarize_fn, summarize_image_with_base64_fn=summarize_with_base64_fn, image_lookup=image_lookup, data=data)
+
+
+def _one_step_behind(items: Iterable[_SourceFile]) -> Iterator[_SourceFile]:
+    """Yield each item once the next one has been produced.
+
+    Sources submit image extraction when they produce a file, so file N's
+    images are decoded in the process pool while file N-1 is parsed.
+    """
+    pending = None
+    for item in items:
+        if pending is not None:
+            yield pending
+        pending = item
+    if pending is not None:
+        yield pending
+
+
+def _with_base_meta(elements: List[Dict[str, Any]], base_meta: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Elements parsed for another file (or run), carrying this file's metadata."""
+    return [{"text": el["text"], "meta": {**el["meta"], **base_meta}} for el in elements]
+
+
+def _source_drive(
+    root_id: str,
+    tmp_dir: str,
+    cpu_pool: ProcessPoolExecutor,
+    *,
+    force: bool,
+    parse_cache: Optional[ParseCache] = None,
+    parse_variant: str = "",
+    ingested_at: Optional[datetime] = None,
+) -> Iterator[_SourceFile]:
+    """Yield the new or modified files under a Drive folder as they finish downloading.
+
+    Files whose content (md5Checksum) was already parsed with the same
+    ``parse_variant`` are yielded straight from ``parse_cache`` without a
+    download.
+    """
+    service = get_drive_service()
+    tmp_root = Path(tmp_dir)
+    tmp_root.mkdir(parents=True, exist_ok=True)
+
+    candidates = []
+    for f in walk_from_root(service, root_id):
+        dtype = resolve_type_from_mime(f.name, f.mime_type)
+        if dtype is not None:
+            candidates.append((f, dtype))
+
+    # Check which documents need sync (new or modified) with a single query
+    if force:
+        stale_ids = {f.id for f, _ in candidates}
+    else:
+        stale_ids = documents_needing_resync({f.id: f.modified_time for f, _ in candidates})
+
+    # Track document sync start
+    track_documents_sync([
+        {"source_doc_id": f.id, "source_doc_name": f.name, "last_modified_at": f.modified_time}
+        for f, _ in candidates
+        if f.id in stale_ids
+    ])
+
+    to_download = [(f, dtype) for f, dtype in candidates if f.id in stale_ids]
+    print(f"[SKIP] {len(candidates) - len(to_download)} of {len(candidates)} files are already up to date")
+    # The traversal leaves out webViewLink; fetch it only for files being ingested
+    links = batch_get_metadata(service, [f.id for f, _ in to_download], fields="id,webViewLink")
+
+    # Downloads are network-bound, so they run in a thread pool while the
+    # main thread parses whichever file finished first. The Drive client's
+    # httplib2 transport is not thread-safe; get_drive_service() hands each
+    # worker thread its own client.
+    # Documents up to this size are parsed straight from memory instead of
+    # being written to the temp dir and read back. Images stay on disk:
+    # their path is stored as image_url and served by the retriever.
+    in_memory_max = int(os.getenv("INGEST_IN_MEMORY_MAX_BYTES", str(16 * 1024 * 1024)))
+    # Most files share a parent folder; only the first one pays for mkdir.
+    # Races between workers are harmless thanks to exist_ok.
+    created_dirs = {tmp_root}
+
+    def _download(f, dtype: str):
+        """Fetch one file; returns (dest, in-memory bytes or None, content digest)."""
+        worker_service = get_drive_service()
+        dest = tmp_root / "/".join([*f.path_segments, f.name])
+        if dtype != "image" and f.size is not None and f.size <= in_memory_max:
+            data = download_file_to_buffer(worker_service, f.id)
+            return dest, data, hashlib.blake2b(data, digest_size=16).digest()
+        if dest.parent not in created_dirs:
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            created_dirs.add(dest.parent)
+        download_file(worker_service, f.id, dest)
+        with open(dest, "rb") as fh:
+            digest = hashlib.file_digest(fh, lambda: hashlib.blake2b(digest_size=16)).digest()
+        return dest, None, digest
+
+    def _base_meta(f, dtype: str) -> Dict[str, Any]:
+        return _drive_base_meta(f, dtype, links.get(f.id, {}).get("webViewLink"), ingested_at)
+
+    cached: List[_SourceFile] = []
+    to_fetch = []
+    for f, dtype in to_download:
+        cache_key = f"{f.md5}:{parse_variant}" if (parse_cache is not None and f.md5) else None
+        elements = parse_cache.get(f.id, cache_key) if cache_key is not None else None
+        if elements is None:
+            to_fetch.append((f, dtype, cache_key))
+            continue
+        cached.append(_SourceFile(path=tmp_root.joinpath(*f.path_segments, f.name), dtype=dtype, base_meta=_base_meta(f, dtype), cached=elements))
+    if cached:
+        print(f"[CACHE] {len(cached)} changed files have content that was already parsed; skipping their download")
+
+    # Images of duplicate uploads come from the first copy
+    seen_digests = set()
+    dl_workers = max(1, int(os.getenv("INGEST_DL_WORKERS", "8")))
+    with ThreadPoolExecutor(max_workers=dl_workers) as pool:
+        futures = {pool.submit(_download, f, dtype): (f, dtype, cache_key) for f, dtype, cache_key in to_fetch}
+        # Cache hits need no download; hand them over while the downloads run
+        yield from cached
+        for future in as_completed(futures):
+            f, dtype, cache_key = futures[future]
+            try:
+                dest, data, digest = future.result()
+            except Exception as e:
+                print(f"[WARN] Download failed {f.name}: {e}")
+                mark_document_failed(f.id, f"Download failed: {str(e)}")
+                continue
+            image_job = None
+            if digest not in seen_digests:
+                seen_digests.add(digest)
+                image_job = _submit_image_job(cpu_pool, dtype, dest, tmp_root / "_images" / f.id, data)
+            yield _SourceFile(
+                path=dest,
+                dtype=dtype,
+                base_meta=_base_meta(f, dtype),
+                data=data,
+                digest=digest,
+                image_job=image_job,
+                cache_key=cache_key,
+            )
+
+
+def _source_local(
+    root: Path,
+    tmp_dir: str,
+    cpu_pool: ProcessPoolExecutor,
+    manifest: IngestManifest,
+    *,
+    force: bool,
+    ingested_at: Optional[datetime] = None,
+) -> Iterator[_SourceFile]:
+    """Yield the files under a local directory that changed since they were last ingested."""
+    for p, st in _iter_files(root):
+        if not force and manifest.is_unchanged(p, st):
+            print(f"[SKIP] {p} is unchanged since last ingest")
+            continue
+        dtype = _ext_to_type(p.suffix.lower())
+        yield _SourceFile(
+            path=p,
+            dtype=dtype,
+            base_meta=build_base_meta(p, st=st, ingested_at=ingested_at),
+            image_job=_submit_image_job(cpu_pool, dtype, p, Path(tmp_dir) / "_images" / p.stem),
+            stat=st,
+        )
 
 
 def main() -> None:
@@ -73,147 +332,198 @@ def main() -> None:
     local_path = os.getenv("INGEST_LOCAL_PATH")
     use_vision = os.getenv("USE_VISION", "true").lower() in {"1", "true", "yes"}  # Force enable for testing
     tmp_dir = os.getenv("INGEST_TMP_DIR", ".ingest_tmp")
+    # Re-ingest everything, ignoring sync records and the local manifest
+    force = os.getenv("INGEST_FORCE", "false").lower() in {"1", "true", "yes"}
+    if not gdrive_root_id and not local_path:
+        raise RuntimeError("Set either GDRIVE_ROOT_ID or INGEST_LOCAL_PATH in environment.")
 
     summarize_fn = summarize_image_llava if (use_vision and summarize_image_llava is not None) else None
     summarize_with_base64_fn = summarize_image_with_base64 if (use_vision and summarize_image_with_base64 is not None) else None
     print(f"[DEBUG] Vision enabled: {use_vision}, summarize_fn available: {summarize_fn is not None}, base64_fn available: {summarize_with_base64_fn is not None}")
 
+    # Every file indexed by this run carries the same ingested_at
+    ingested_at = datetime.now(UTC)
     num_files = 0
     total_elements = 0
     total_chunks = 0
-    all_chunks: List[DocumentChunk] = []
+    # Chunks are embedded and upserted in INGEST_UPSERT_BATCH slices on
+    # background threads while files are still being downloaded and parsed,
+    # instead of holding every chunk of the run in memory until the end.
+    # Up to QDRANT_UPSERT_WORKERS slices are in flight, so one slice's
+    # embedding calls overlap another slice's Qdrant writes. Each slice writes
+    # its batches sequentially, keeping that setting the single bound on
+    # concurrent Qdrant writers. All slices share one client and its pool.
+    upsert_batch = max(1, int(os.getenv("INGEST_UPSERT_BATCH", "256")))
+    upsert_workers = max(1, Config.QDRANT_UPSERT_WORKERS)
+    pending_chunks: List[DocumentChunk] = []
+    upserts = []  # futures of upsert_document_chunks calls
+    upsert_pool = ThreadPoolExecutor(max_workers=upsert_workers)
+    qdrant = get_client()
+    collection: Optional[str] = None
+
+    def _upsert(chunks: List[DocumentChunk]) -> None:
+        nonlocal collection
+        if collection is None:
+            # Checked (and created if missing) once, on the main thread, before
+            # the first slice is submitted; the slices then skip the check.
+            collection = ensure_collection(qdrant, vector_size=get_embedding_client().dimension)
+        upserts.append(upsert_pool.submit(upsert_document_chunks, chunks, client=qdrant, collection=collection, write_workers=1))
+
+    def _queue_chunks(chunks: List[DocumentChunk]) -> None:
+        pending_chunks.extend(chunks)
+        while len(pending_chunks) >= upsert_batch:
+            _upsert(pending_chunks[:upsert_batch])
+            del pending_chunks[:upsert_batch]
+
     processed_docs = set()  # Track successfully processed document IDs
+    # Parsed elements of Drive files are kept across runs, keyed by content.
+    # INGEST_FORCE still re-embeds and re-indexes everything but reuses these;
+    # set INGEST_PARSE_CACHE=false to re-parse as well (e.g. after loader changes).
+    parse_cache = None
+    if gdrive_root_id and os.getenv("INGEST_PARSE_CACHE", "true").lower() in {"1", "true", "yes"}:
+        parse_cache = ParseCache(os.getenv("INGEST_PARSE_CACHE_PATH", str(Path(tmp_dir) / "parse_cache.sqlite")))
+    parse_variant = "vision" if (summarize_fn is not None or summarize_with_base64_fn is not None) else "text"
+    manifest = None
+    manifest_entries = []  # (path, stat, chunk_count) of local files to record after indexing
+    # The same document is often uploaded into several PI/<uid> folders.
+    # Copies are parsed (and their images summarized) only once; later
+    # copies reuse the elements under their own metadata, and their
+    # identical chunk texts hit the embedding client's cache.
+    elements_by_digest: Dict[bytes, List[Dict[str, Any]]] = {}
+    # Copies that arrived while the first file with their digest was still being parsed
+    waiting_copies: Dict[bytes, List[_SourceFile]] = {}
 
-    if gdrive_root_id:
-        service = get_drive_service()
-        tmp_root = Path(tmp_dir)
-        tmp_root.mkdir(parents=True, exist_ok=True)
+    def _fail(item: _SourceFile, error: Exception) -> None:
+        print(f"[WARN] Processing failed for {item.base_meta['source_doc_name']}: {error}")
+        if item.stat is None:
+            mark_document_failed(item.base_meta["source_doc_id"], f"Processing failed: {str(error)}")
 
-        for f in walk_from_root(service, gdrive_root_id):
-            dtype = resolve_type_from_mime(f.name, f.mime_type)
-            if dtype is None:
-                continue
-            
-            # Check if document needs sync (new or modified)
-            if not document_needs_resync(f.id, f.modified_time):
-                print(f"[SKIP] {f.name} is already up to date")
-                continue
-            
-            num_files += 1
-            
-            # Track document sync start
-            track_document_sync(f.id, f.name, f.modified_time)
-            
-            # Classify PI/NON PI from logical path
-            is_pi, uid, roles = classify_from_path(f.path_segments)
-            # Download to temp path
-            dest = tmp_root / "/".join([*f.path_segments, f.name])
-            dest.parent.mkdir(parents=True, exist_ok=True)
-            try:
-                download_file(service, f.id, dest)
-            except Exception as e:
-                print(f"[WARN] Download failed {f.name}: {e}")
-                mark_document_failed(f.id, f"Download failed: {str(e)}")
-                continue
-            base_meta = {
-                "source_doc_id": f.id,
-                "source_doc_name": f.name,
-                "source_doc_type": dtype,
-                "source_doc_url": f.web_view_link,
-                "doc_mime_type": f.mime_type,
-                "owner_uid": uid,
-                "uid": uid,
-                "roles_allowed": roles,
-                "is_pi": is_pi,
-                "folder_path": "/".join(f.path_segments),
-                "source_last_modified_at": f.modified_time,
-                "ingested_at": datetime.now(UTC),
-                "language": "en",
-            }
-            # Optional: extract images for PDFs and DOCX
-            image_lookup = None
-            if dtype == "pdf":
-                extracted_dir = Path(tmp_dir) / "_images" / f.id
-                page_map = extract_pdf_images(str(dest), str(extracted_dir))
-
-                def _lookup(page_no: int):
-                    return page_map.get(page_no, [])
-
-                image_lookup = _lookup
-            elif dtype == "docx":
-                extracted_dir = Path(tmp_dir) / "_images" / f.id
-                img_paths = extract_docx_images(str(dest), str(extracted_dir))
-                # naive: map all images to page 1 (DOCX lacks native pages)
-                def _lookup(_: int):
-                    return img_paths
-
-                image_lookup = _lookup
+    def _emit(item: _SourceFile, elements: List[Dict[str, Any]]) -> None:
+        nonlocal total_elements, total_chunks
+        try:
+            chunks = chunk_elements(elements)
+        except Exception as e:
+            _fail(item, e)
+            return
+        if parse_cache is not None and item.cache_key is not None and item.cached is None:
+            parse_cache.put(item.base_meta["source_doc_id"], item.cache_key, elements)
+        total_elements += len(elements)
+        total_chunks += len(chunks)
+        _queue_chunks(chunks)
+        # Record success; documents are marked synced only after indexing
+        if item.stat is not None:
+            manifest_entries.append((item.path, item.stat, len(chunks)))
+        else:
+            processed_docs.add(item.base_meta["source_doc_id"])
+        print(f"[SUCCESS] Processed {item.base_meta['source_doc_name']}: {len(elements)} elements, {len(chunks)} chunks")
 
+    def _emit_copy(item: _SourceFile, elements: List[Dict[str, Any]]) -> None:
+        print(f"[DEDUP] {item.base_meta['source_doc_name']} has the same content as an earlier file; reusing its elements")
+        _emit(item, _with_base_meta(elements, item.base_meta))
+
+    cpu_workers = max(1, int(os.getenv("INGEST_CPU_WORKERS", str(os.cpu_count() or 1))))
+    # Files are parsed in the process pool too; at most this many are in
+    # flight so downloaded bytes and parsed elements do not pile up in memory.
+    parse_window = max(1, int(os.getenv("INGEST_PARSE_WINDOW", str(2 * cpu_workers))))
+    in_flight: Dict[Future, _SourceFile] = {}
+    # Image extraction and parsing are CPU-bound (PyMuPDF and pdfminer hold
+    # the GIL), so both run in a process pool. Workers are spawned, not
+    # forked, since download threads may already be running.
+    with ProcessPoolExecutor(max_workers=cpu_workers, mp_context=multiprocessing.get_context("spawn")) as cpu_pool:
+
+        def _submit(item: _SourceFile) -> None:
             try:
-                elements = load_file_to_elements(str(dest), base_meta, summarize_image_fn=summarize_fn, summarize_image_with_base64_fn=summarize_with_base64_fn, image_lookup=image_lookup)
-                total_elements += len(elements)
-                chunks = chunk_elements(elements)
-                total_chunks += len(chunks)
-                all_chunks.extend(chunks)
-                processed_docs.add(f.id)  # Track successful processing
-                
-                # Mark document as successfully processed (will be marked synced after indexing)
-                print(f"[SUCCESS] Processed {f.name}: {len(elements)} elements, {len(chunks)} chunks")
-                
+                images = item.image_job.result() if item.image_job is not None else None
+                future = cpu_pool.submit(
+                    _parse_source_file, str(item.path), item.base_meta, item.dtype, images, item.data,
+                    summarize_fn, summarize_with_base64_fn,
+                )
             except Exception as e:
-                print(f"[WARN] Processing failed for {f.name}: {e}")
-                mark_document_failed(f.id, f"Processing failed: {str(e)}")
-                continue
-    elif local_path:
-        root = Path(local_path)
-        assert root.exists() and root.is_dir(), f"Path does not exist or not a directory: {root}"
-        for p in sorted(root.rglob("*")):
-            if not p.is_file():
-                continue
+                _parse_failed(item, e)
+                return
+            in_flight[future] = item
+
+        def _parse_failed(item: _SourceFile, error: Exception) -> None:
+            _fail(item, error)
+            # Waiting copies get parsed on their own instead
+            for copy in waiting_copies.pop(item.digest, []) if item.digest is not None else []:
+                _submit(copy)
+
+        def _drain(limit: int) -> None:
+            """Handle finished parses until at most ``limit`` are in flight."""
+            while len(in_flight) > limit:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = in_flight.pop(future)
+                    try:
+                        elements = future.result()
+                    except Exception as e:
+                        _parse_failed(item, e)
+                        continue
+                    _emit(item, elements)
+                    if item.digest is not None:
+                        elements_by_digest[item.digest] = elements
+                        for copy in waiting_copies.pop(item.digest, []):
+                            _emit_copy(copy, elements)
+
+        if gdrive_root_id:
+            source = _source_drive(
+                gdrive_root_id, tmp_dir, cpu_pool,
+                force=force, parse_cache=parse_cache, parse_variant=parse_variant, ingested_at=ingested_at,
+            )
+        else:
+            root = Path(local_path)
+            assert root.exists() and root.is_dir(), f"Path does not exist or not a directory: {root}"
+            manifest = IngestManifest(os.getenv("INGEST_MANIFEST_PATH", str(Path(tmp_dir) / "ingest_manifest.sqlite")))
+            source = _source_local(root, tmp_dir, cpu_pool, manifest, force=force, ingested_at=ingested_at)
+
+        for item in _one_step_behind(source):
             num_files += 1
-            base_meta = build_base_meta(p)
-            # Optional: extract images for PDFs and DOCX locally as well
-            image_lookup = None
-            dtype_local = _ext_to_type(p.suffix.lower())
-            if dtype_local == "pdf":
-                extracted_dir = Path(tmp_dir) / "_images" / p.stem
-                page_map = extract_pdf_images(str(p), str(extracted_dir))
-
-                def _lookup(page_no: int):
-                    return page_map.get(page_no, [])
-
-                image_lookup = _lookup
-            elif dtype_local == "docx":
-                extracted_dir = Path(tmp_dir) / "_images" / p.stem
-                img_paths = extract_docx_images(str(p), str(extracted_dir))
-
-                def _lookup(_: int):
-                    return img_paths
-
-                image_lookup = _lookup
-            try:
-                elements = load_file_to_elements(str(p), base_meta, summarize_image_fn=summarize_fn, summarize_image_with_base64_fn=summarize_with_base64_fn, image_lookup=image_lookup)
-            except Exception as e:
-                print(f"[WARN] Skipping {p}: {e}")
+            if item.cached is not None:
+                print(f"[CACHE] {item.base_meta['source_doc_name']} content is unchanged; reusing its parsed elements")
+                _emit(item, _with_base_meta(item.cached, item.base_meta))
                 continue
-            total_elements += len(elements)
-            chunks = chunk_elements(elements)
-            total_chunks += len(chunks)
-            all_chunks.extend(chunks)
-    else:
-        raise RuntimeError("Set either GDRIVE_ROOT_ID or INGEST_LOCAL_PATH in environment.")
+            if item.digest is not None:
+                if item.digest in elements_by_digest:
+                    _emit_copy(item, elements_by_digest[item.digest])
+                    continue
+                if item.digest in waiting_copies:
+                    waiting_copies[item.digest].append(item)
+                    continue
+                waiting_copies[item.digest] = []
+            _submit(item)
+            _drain(parse_window - 1)
+        _drain(0)
+
+    if pending_chunks:
+        _upsert(pending_chunks[:])
+        pending_chunks.clear()
+    upsert_pool.shutdown(wait=True)
+    if parse_cache is not None:
+        parse_cache.commit()
+        parse_cache.close()
 
-    if not all_chunks:
+    if not upserts:
+        if manifest is not None:
+            manifest.close()
         print("No chunks to index. Exiting.")
         return
 
-    written = upsert_document_chunks(all_chunks)
+    written = sum(future.result() for future in upserts)
+    if manifest is not None:
+        manifest.record(manifest_entries)
+        manifest.close()
     
     # Mark successfully indexed documents as synced
     synced_count = 0
-    for doc_id in processed_docs:
-        if mark_document_synced(doc_id):
-            synced_count += 1
+    db = get_sync_db()
+    try:
+        for doc_id in processed_docs:
+            if mark_document_synced(doc_id, db=db):
+                synced_count += 1
+        db.commit()  # one commit for the whole batch
+    finally:
+        db.close()
 
     print(
         f"Ingestion complete: files={num_files}, elements={total_elements}, chunks={total_chunks}, indexed={written}, synced={synced_count}"
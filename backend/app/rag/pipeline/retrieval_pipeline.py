@@ -1,4 +1,5 @@
 import logging
+import re
 import time
 from typing import List, Dict, Optional
 from uuid import UUID
@@ -19,6 +20,7 @@ from app.rag.api.retriever_schemas import DocumentChunk, QueryResponse, AuditLog
 
 
 from app.rag.core.embed import get_embedding_client 
+from app.rag.storage.index_qdrant import QUANTIZED_SEARCH_PARAMS
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -29,6 +31,16 @@ SANITIZE_REGEXES: List[str] = [
     r"(?i)you are now",
     r"(?i)act as",
 ]
+# Applied one after another, so text left behind by one removal is still
+# checked against the later patterns.
+_SANITIZE_PATTERNS = [re.compile(pattern) for pattern in SANITIZE_REGEXES]
+# One case-insensitive alternation of every pattern. It matches a superset of
+# what the patterns above match, so a query it finds nothing in is returned
+# after a single scan instead of one pass per pattern.
+_SANITIZE_DETECTOR = re.compile(
+    "|".join(f"(?:{pattern.removeprefix('(?i)')})" for pattern in SANITIZE_REGEXES),
+    re.IGNORECASE,
+)
 
 
 class RetrievalPipeline:
@@ -74,9 +86,11 @@ class RetrievalPipeline:
 
     def _sanitize_query(self, query: str) -> str:
         """Basic regex-based sanitization to mitigate prompt injection."""
+        if not _SANITIZE_DETECTOR.search(query):
+            return query.strip()
         sanitized = query
-        for pattern in SANITIZE_REGEXES:
-            sanitized = __import__("re").sub(pattern, "", sanitized)
+        for pattern in _SANITIZE_PATTERNS:
+            sanitized = pattern.sub("", sanitized)
         return sanitized.strip()
 
     async def retrieve_and_answer(
@@ -116,6 +130,7 @@ class RetrievalPipeline:
                 with_payload=True,
                 with_vectors=False,
                 query_filter=access_filter,
+                search_params=QUANTIZED_SEARCH_PARAMS,
             )
 
             # 4) Convert to DocumentChunk and enforce defense-in-depth checks
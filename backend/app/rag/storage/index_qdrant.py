@@ -1,23 +1,45 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from typing import Iterable, List, Optional, Dict, Any
 import os
 
+from pydantic import TypeAdapter
 from qdrant_client import QdrantClient
 from qdrant_client.models import (
+    Batch,
     Distance,
     VectorParams,
     PointStruct,
     Filter,
     FieldCondition,
     MatchValue,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
 )
 
 from app.rag.config.config import load_qdrant_config
-from app.rag.core.schemas import DocumentChunk
+from app.rag.core.schemas import ChunkMeta, DocumentChunk
 from app.rag.core.embed import EmbeddingClient, get_embedding_client
 
 
+# int8 scalar quantization keeps a ~4x smaller copy of the vectors in RAM;
+# searches rescore the top candidates against the original float32 vectors.
+QUANTIZATION_CONFIG = ScalarQuantization(
+    scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+)
+QUANTIZED_SEARCH_PARAMS = SearchParams(
+    quantization=QuantizationSearchParams(ignore=False, rescore=True, oversampling=2.0)
+)
+
+# Dumps a whole batch of chunk metadata (PI flags, roles, provenance) in one
+# call into pydantic-core instead of a model_dump() per chunk.
+_CHUNK_META_LIST = TypeAdapter(List[ChunkMeta])
+
+
 def get_client() -> QdrantClient:
     cfg = load_qdrant_config()
     from app.rag.config.config import Config
@@ -25,14 +47,18 @@ def get_client() -> QdrantClient:
     if Config.QDRANT_URL:
         return QdrantClient(
             url=Config.QDRANT_URL, 
-            api_key=cfg.api_key
+            api_key=cfg.api_key,
+            prefer_grpc=Config.QDRANT_PREFER_GRPC,
+            grpc_port=Config.QDRANT_GRPC_PORT,
         )
     else:
         return QdrantClient(
             host=cfg.host, 
             port=cfg.port, 
             https=getattr(Config, 'QDRANT_USE_SSL', False),
-            api_key=cfg.api_key
+            api_key=cfg.api_key,
+            prefer_grpc=Config.QDRANT_PREFER_GRPC,
+            grpc_port=Config.QDRANT_GRPC_PORT,
         )
 
 
@@ -52,6 +78,7 @@ def ensure_collection(client: QdrantClient, vector_size: int, *, force: bool = F
                 vectors_config={
                     "text": VectorParams(size=vector_size, distance=Distance.COSINE)
                 },
+                quantization_config=QUANTIZATION_CONFIG,
             )
         else:
             # If exists and not forced, we are done
@@ -63,6 +90,7 @@ def ensure_collection(client: QdrantClient, vector_size: int, *, force: bool = F
             vectors_config={
                 "text": VectorParams(size=vector_size, distance=Distance.COSINE)
             },
+            quantization_config=QUANTIZATION_CONFIG,
         )
     return name
 
@@ -80,52 +108,74 @@ def upsert_document_chunks(
     *,
     embedding: Optional[EmbeddingClient] = None,
     batch_size: int = 64,
+    client: Optional[QdrantClient] = None,
+    collection: Optional[str] = None,
+    write_workers: Optional[int] = None,
 ) -> int:
     """Embed and upsert chunks into Qdrant. Returns number of points written.
 
     This function loads Qdrant config from the environment and ensures the
-    collection exists with the correct vector size.
+    collection exists with the correct vector size. Callers upserting many
+    slices can pass a shared ``client`` to reuse its connections, and the
+    ``collection`` name returned by an earlier ensure_collection() call to skip
+    that check (concurrent slices must not each try to create it).
+    Batches are written by up to ``write_workers`` threads (default
+    QDRANT_UPSERT_WORKERS); callers that already run several upserts at once
+    pass 1 so that setting stays the only bound on concurrent writers.
     """
     emb = embedding or get_embedding_client()
-    client = get_client()
-    collection = ensure_collection(client, vector_size=emb.dimension)
+    client = client or get_client()
+    if collection is None:
+        collection = ensure_collection(client, vector_size=emb.dimension)
 
     # Materialize list to batch
     chunk_list: List[DocumentChunk] = list(chunks)
-    written = 0
-    for i in range(0, len(chunk_list), batch_size):
+    # Embed everything in one call so the client can dedupe and size its own
+    # API batches across the whole set; Qdrant writes stay in batch_size slices.
+    all_vecs = emb.encode_texts([c.text for c in chunk_list])
+    # Index-time fields are the same for every chunk; ChunkMeta never carries
+    # them, so they are merged in rather than setdefault'ed one by one.
+    index_fields = {
+        "embedding_model": emb.model_name,
+        "embedding_dim": emb.dimension,
+        "pipeline_version": os.getenv("PIPELINE_VERSION", "0.1.0"),
+    }
+
+    def _upsert_batch(i: int) -> int:
         batch = chunk_list[i : i + batch_size]
-        texts = [c.text for c in batch]
-        vecs = emb.encode_texts(texts)
-        # Build points with named vector
-        points: List[PointStruct] = []
-        for j in range(len(batch)):
+        vecs = all_vecs[i : i + batch_size]
+        # Column-oriented batch: one float32 block for the named vector instead
+        # of a PointStruct (and its own vector list) per chunk
+        payloads: List[Dict[str, Any]] = _CHUNK_META_LIST.dump_python([chunk.meta for chunk in batch])
+        for chunk, payload in zip(batch, payloads):
             # Fill small metadata adds at index time
-            meta = batch[j].meta
-            payload = meta.model_dump()
-            
+            payload.update(index_fields)
+            payload["text"] = chunk.text  # ensure text is retrievable
+            payload["doc_url"] = payload["source_doc_url"]  # alias for retrieval
+            payload["created_at"] = payload["ingested_at"]
+
             # Debug: Check if image_base64 is in payload
             if payload.get("is_image") and "image_base64" in payload:
                 print(f"[DEBUG] Storing image chunk with base64: {len(payload['image_base64'])} chars")
             elif payload.get("is_image"):
                 print("[DEBUG] Storing image chunk but no base64 in payload")
-            
-            payload.setdefault("embedding_model", emb.model_name)
-            payload.setdefault("embedding_dim", emb.dimension)
-            payload.setdefault("pipeline_version", os.getenv("PIPELINE_VERSION", "0.1.0"))
-            payload["text"] = batch[j].text  # ensure text is retrievable
-            payload.setdefault("doc_url", payload.get("source_doc_url"))  # alias for retrieval
-            payload.setdefault("created_at", payload.get("ingested_at")) 
-            points.append(
-                PointStruct(
-                    id=meta.chunk_id,
-                    vector={"text": vecs[j].tolist()},
-                    payload=payload,
-                )
-            )
+        points = Batch(
+            ids=[chunk.meta.chunk_id for chunk in batch],
+            vectors={"text": vecs.tolist()},
+            payloads=payloads,
+        )
         client.upsert(collection_name=collection, points=points)
-        written += len(points)
-    return written
+        return len(batch)
+
+    starts = range(0, len(chunk_list), batch_size)
+    if write_workers is None:
+        from app.rag.config.config import Config
+        write_workers = Config.QDRANT_UPSERT_WORKERS
+    if write_workers <= 1:
+        return sum(map(_upsert_batch, starts))
+    # Independent batches are written concurrently over the client's pool
+    with ThreadPoolExecutor(max_workers=write_workers) as pool:
+        return sum(pool.map(_upsert_batch, starts))
 
 
 def build_filter(eq: Optional[Dict[str, Any]] = None) -> Optional[Filter]:
@@ -201,6 +251,7 @@ def search_text(
         with_payload=True,
         with_vectors=with_vectors,
         query_filter=flt,
+        search_params=QUANTIZED_SEARCH_PARAMS,
     )
 
 
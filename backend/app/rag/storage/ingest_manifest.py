@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterable, Tuple
+import os
+import sqlite3
+
+
+class IngestManifest:
+    """SQLite record of local files already ingested, keyed by path.
+
+    Drive documents are tracked in the DocumentSync table; local-path runs have
+    no database row to compare against, so this manifest lets a re-run skip
+    files whose size and mtime are unchanged since they were last indexed.
+    """
+
+    def __init__(self, db_path: str | os.PathLike[str]):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path))
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, chunk_count INTEGER)"
+        )
+
+    def is_unchanged(self, path: Path, st: os.stat_result) -> bool:
+        row = self._conn.execute(
+            "SELECT mtime_ns, size FROM files WHERE path = ?", (str(path),)
+        ).fetchone()
+        return row is not None and row[0] == st.st_mtime_ns and row[1] == st.st_size
+
+    def record(self, entries: Iterable[Tuple[Path, os.stat_result, int]]) -> None:
+        """Store (path, stat, chunk_count) for files that were indexed successfully."""
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO files (path, mtime_ns, size, chunk_count) VALUES (?, ?, ?, ?)",
+            [(str(path), st.st_mtime_ns, st.st_size, count) for path, st, count in entries],
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
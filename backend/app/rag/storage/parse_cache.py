@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import json
+import os
+import sqlite3
+
+
+def _json_default(value: Any) -> Any:
+    # Datetimes come from the file's base metadata, which callers overlay on
+    # cached elements; ChunkMeta parses the ISO strings back either way.
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _images_exist(elements: List[Dict[str, Any]]) -> bool:
+    """Whether every image file the elements point at is still on disk."""
+    return all(
+        Path(el["meta"]["image_url"]).exists()
+        for el in elements
+        if el["meta"].get("image_url")
+    )
+
+
+class ParseCache:
+    """SQLite store of parsed elements for Drive files, keyed by file id.
+
+    Each row remembers the content key (Drive md5Checksum plus parse options)
+    the elements were produced from. A file whose modifiedTime changed but
+    whose bytes did not, or a forced re-index, reuses the stored elements
+    instead of downloading, parsing and summarizing the file again. A new
+    content key replaces the row.
+
+    Elements are stored as JSON. Image elements point at files extracted
+    into the temp dir; a row whose images are gone is treated as a miss, so
+    the file is downloaded and its images extracted again.
+    """
+
+    def __init__(self, db_path: str | os.PathLike[str]):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path))
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS elements ("
+            "file_id TEXT PRIMARY KEY, content_key TEXT, elements TEXT)"
+        )
+
+    def get(self, file_id: str, content_key: str) -> Optional[List[Dict[str, Any]]]:
+        row = self._conn.execute(
+            "SELECT content_key, elements FROM elements WHERE file_id = ?", (file_id,)
+        ).fetchone()
+        if row is None or row[0] != content_key:
+            return None
+        elements = json.loads(row[1])
+        return elements if _images_exist(elements) else None
+
+    def put(self, file_id: str, content_key: str, elements: List[Dict[str, Any]]) -> None:
+        """Store elements; written on the next commit()."""
+        self._conn.execute(
+            "INSERT OR REPLACE INTO elements (file_id, content_key, elements) VALUES (?, ?, ?)",
+            (file_id, content_key, json.dumps(elements, default=_json_default)),
+        )
+
+    def commit(self) -> None:
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
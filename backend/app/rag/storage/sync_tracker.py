@@ -1,8 +1,10 @@
-from typing import Optional
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 from datetime import datetime, UTC
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 from app.models.document_sync import DocumentSync, SyncStatus
 from app.core.database import SessionLocal
@@ -17,80 +19,129 @@ def get_sync_db():
         pass  # Don't close here, let caller manage
 
 
+@contextmanager
+def _sync_session(db: Optional[Session] = None) -> Iterator[Session]:
+    """Yield the caller's session as-is, or a fresh one that is closed afterwards.
+
+    Functions below only commit sessions they opened themselves; a caller that
+    passes ``db`` is expected to commit once after its batch of updates.
+    """
+    if db is not None:
+        yield db
+        return
+    db = get_sync_db()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
 def track_document_sync(
     source_doc_id: str,
     source_doc_name: str,
     last_modified_at: datetime,
-    sync_status: SyncStatus = SyncStatus.PENDING
+    sync_status: SyncStatus = SyncStatus.PENDING,
+    *,
+    db: Optional[Session] = None,
 ) -> DocumentSync:
     """Create or update document sync tracking record"""
-    db = get_sync_db()
-    try:
-        # Check if document already exists
-        existing = db.query(DocumentSync).filter(
-            DocumentSync.source_doc_id == source_doc_id
-        ).first()
-        
-        if existing:
-            # Update existing record
-            existing.source_doc_name = source_doc_name
-            existing.last_modified_at = last_modified_at
-            existing.sync_status = sync_status
-            existing.updated_at = datetime.now(UTC)
-            db.commit()
-            db.refresh(existing)
-            return existing
-        else:
-            # Create new record
-            sync_record = DocumentSync(
-                source_doc_id=source_doc_id,
-                source_doc_name=source_doc_name,
-                last_modified_at=last_modified_at,
-                sync_status=sync_status
-            )
-            db.add(sync_record)
-            db.commit()
-            db.refresh(sync_record)
-            return sync_record
-    finally:
-        db.close()
+    return track_documents_sync([
+        {
+            "source_doc_id": source_doc_id,
+            "source_doc_name": source_doc_name,
+            "last_modified_at": last_modified_at,
+            "sync_status": sync_status,
+        }
+    ], db=db)[0]
+
+
+def track_documents_sync(
+    records: Iterable[Dict[str, Any]],
+    *,
+    db: Optional[Session] = None,
+) -> List[DocumentSync]:
+    """Create or update many document sync tracking records in one statement.
+
+    Each record needs source_doc_id, source_doc_name and last_modified_at;
+    sync_status defaults to PENDING. Uses a single INSERT ... ON CONFLICT DO
+    UPDATE instead of a SELECT + INSERT/UPDATE round-trip per document.
+    """
+    now = datetime.now(UTC)
+    # Postgres rejects a statement that touches the same row twice, so keep
+    # only the last record per document.
+    rows: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        rows[record["source_doc_id"]] = {
+            "source_doc_id": record["source_doc_id"],
+            "source_doc_name": record["source_doc_name"],
+            "last_modified_at": record["last_modified_at"],
+            "sync_status": record.get("sync_status", SyncStatus.PENDING),
+            "updated_at": now,
+        }
+    if not rows:
+        return []
+
+    stmt = insert(DocumentSync).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DocumentSync.source_doc_id],
+        set_={
+            "source_doc_name": stmt.excluded.source_doc_name,
+            "last_modified_at": stmt.excluded.last_modified_at,
+            "sync_status": stmt.excluded.sync_status,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    ).returning(DocumentSync)
+
+    owns_session = db is None
+    with _sync_session(db) as session:
+        sync_records = session.scalars(
+            stmt, execution_options={"populate_existing": True}
+        ).all()
+        if owns_session:
+            # Detach before commit so the returned rows stay loaded without a refresh
+            session.expunge_all()
+            session.commit()
+        return list(sync_records)
 
 
-def mark_document_synced(source_doc_id: str) -> Optional[DocumentSync]:
+def mark_document_synced(source_doc_id: str, *, db: Optional[Session] = None) -> Optional[DocumentSync]:
     """Mark a document as successfully synced"""
-    db = get_sync_db()
-    try:
-        sync_record = db.query(DocumentSync).filter(
+    owns_session = db is None
+    with _sync_session(db) as session:
+        sync_record = session.query(DocumentSync).filter(
             DocumentSync.source_doc_id == source_doc_id
         ).first()
         
         if sync_record:
             sync_record.mark_synced()
             sync_record.last_synced_at = datetime.now(UTC)
-            db.commit()
-            db.refresh(sync_record)
+            if owns_session:
+                session.commit()
+                session.refresh(sync_record)
             return sync_record
         return None
-    finally:
-        db.close()
 
 
-def mark_document_failed(source_doc_id: str, error_message: str) -> Optional[DocumentSync]:
+def mark_document_failed(
+    source_doc_id: str,
+    error_message: str,
+    *,
+    db: Optional[Session] = None,
+) -> Optional[DocumentSync]:
     """Mark a document sync as failed"""
-    db = get_sync_db()
-    try:
-        sync_record = db.query(DocumentSync).filter(
+    owns_session = db is None
+    with _sync_session(db) as session:
+        sync_record = session.query(DocumentSync).filter(
             DocumentSync.source_doc_id == source_doc_id
         ).first()
         
         if sync_record:
             sync_record.mark_failed(error_message)
-            db.commit()
-            db.refresh(sync_record)
+            if owns_session:
+                session.commit()
+                session.refresh(sync_record)
             return sync_record
         return None
-    finally:
-        db.close()
 
 
 def get_documents_needing_sync() -> list[DocumentSync]:
@@ -117,4 +168,26 @@ def document_needs_resync(source_doc_id: str, drive_modified_time: datetime) ->
         
         return sync_record.needs_sync(drive_modified_time)
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def documents_needing_resync(modified_times: Dict[str, datetime]) -> set[str]:
+    """Return the ids from a {source_doc_id: drive_modified_time} map that need re-syncing.
+
+    Bulk counterpart of document_needs_resync: one IN query on the indexed
+    source_doc_id column instead of one SELECT per document.
+    """
+    if not modified_times:
+        return set()
+    db = get_sync_db()
+    try:
+        sync_records = db.query(DocumentSync).filter(
+            DocumentSync.source_doc_id.in_(list(modified_times))
+        ).all()
+        up_to_date = {
+            record.source_doc_id
+            for record in sync_records
+            if not record.needs_sync(modified_times[record.source_doc_id])
+        }
+        return set(modified_times) - up_to_date
+    finally:
+        db.close()
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import json
+import os
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib json fallback is slower
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # optional; without it the JSON array is loaded whole
+    ijson = None
+
+
+# Rewrite the log once it holds this many lines per live channel
+COMPACT_RATIO = 2
+
+
+def log_path(channels_file: Path) -> Path:
+    """The JSON Lines log kept next to a webhook_channels.json array."""
+    return Path(channels_file).with_suffix('.jsonl')
+
+
+def _encode_record(record: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(record) + b'\n'
+    return (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def _decode(data: bytes):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def channels_exist(channels_file: Path) -> bool:
+    return Path(channels_file).exists() or log_path(channels_file).exists()
+
+
+def append_record(channels_file: Path, record: dict) -> None:
+    """Append one channel record (or an {"op": "update", ...} record) to the log."""
+    with open(log_path(channels_file), 'ab') as f:
+        f.write(_encode_record(record))
+
+
+def read_channels(channels_file: Path) -> Tuple[Dict[str, dict], int]:
+    """Return (channel_id -> current record, number of log lines).
+
+    Channels come from the webhook_channels.json array written by older
+    versions, then from the log next to it, where later records win and
+    "update" records are merged into the channel they name. Neither file is
+    modified.
+    """
+    channels_file = Path(channels_file)
+    channels: Dict[str, dict] = {}
+    if channels_file.exists():
+        with open(channels_file, 'rb') as f:
+            # Stream the JSON array one channel at a time when ijson is available
+            saved = ijson.items(f, 'item', use_float=True) if ijson is not None else _decode(f.read())
+            for channel in saved:
+                channels[channel.get('channel_id')] = channel
+    line_count = 0
+    log = log_path(channels_file)
+    if log.exists():
+        with open(log, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                line_count += 1
+                record = _decode(line)
+                channel_id = record.get('channel_id')
+                if record.pop('op', None) == 'update':
+                    # Updates only apply to channels saved earlier
+                    if channel_id in channels:
+                        channels[channel_id].update(record)
+                else:
+                    channels[channel_id] = record
+    return channels, line_count
+
+
+def load_channels(channels_file: Path) -> Dict[str, dict]:
+    """Fold the saved channels into channel_id -> current record."""
+    channels, _ = read_channels(channels_file)
+    return channels
+
+
+def compact(channels_file: Path, channels: Optional[Dict[str, dict]] = None) -> None:
+    """Rewrite the log with one record per channel.
+
+    The JSON array is left in place; its channels are repeated in the log,
+    which takes precedence when both are read.
+    """
+    if channels is None:
+        channels = load_channels(channels_file)
+    log = log_path(channels_file)
+    tmp_path = log.with_suffix('.jsonl.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(b''.join(_encode_record(record) for record in channels.values()))
+    os.replace(tmp_path, log)
+
+
+def compact_if_needed(channels_file: Path) -> bool:
+    """Compact the log when updates have piled up; returns whether it did."""
+    if not log_path(channels_file).exists():
+        return False
+    channels, line_count = read_channels(channels_file)
+    if line_count <= COMPACT_RATIO * max(1, len(channels)):
+        return False
+    compact(channels_file, channels)
+    return True
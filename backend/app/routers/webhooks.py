@@ -166,18 +166,15 @@ def _is_known_channel(channel_id: str) -> bool:
     if channel_id.startswith("orris-sync-"):
         return True
     
-    # Check against saved channels file (if exists)
+    # Check against saved channels (JSON array and the channel log next to it)
     try:
-        from pathlib import Path
-        import json
-        
         from app.core.paths import WEBHOOK_CHANNELS_PATH
-        channels_file = WEBHOOK_CHANNELS_PATH
-        if channels_file.exists():
-            with open(channels_file, 'r') as f:
-                channels = json.load(f)
-                known_ids = [ch.get('channel_id') for ch in channels if ch.get('status') == 'active']
-                return channel_id in known_ids
+        from app.rag.storage import webhook_channel_log
+
+        if webhook_channel_log.channels_exist(WEBHOOK_CHANNELS_PATH):
+            channels = webhook_channel_log.load_channels(WEBHOOK_CHANNELS_PATH).values()
+            known_ids = [ch.get('channel_id') for ch in channels if ch.get('status') == 'active']
+            return channel_id in known_ids
     except Exception as e:
         logger.warning(f"Could not verify channel ID against saved channels: {e}")
     
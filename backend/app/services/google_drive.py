@@ -22,11 +22,20 @@ class GoogleDriveService:
     def __init__(self):
         self.folder_id = settings.google_drive_folder_id
         self.scopes = ['https://www.googleapis.com/auth/drive.readonly']
+        self._service = None
+        self._service_token: Optional[str] = None
 
     def _build_service(self, access_token: str):
-        """Build Google Drive service with access token"""
-        credentials = Credentials(token=access_token)
-        return build('drive', 'v3', credentials=credentials)
+        """Build Google Drive service with access token.
+
+        The service for the most recent token is reused, so search_documents
+        does not rebuild the client for every document it fetches.
+        """
+        if self._service is None or self._service_token != access_token:
+            credentials = Credentials(token=access_token)
+            self._service = build('drive', 'v3', credentials=credentials, cache_discovery=False)
+            self._service_token = access_token
+        return self._service
 
     async def list_documents(self, access_token: str) -> List[Dict[str, Any]]:
         """List all documents in the specified Google Drive folder"""
@@ -1,21 +1,16 @@
 import os
 import logging
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, UTC
 from pathlib import Path
 import asyncio
-import certifi
+import uuid
 from googleapiclient.errors import HttpError
 import logging
 
 
-# Configure SSL certificates for Google API calls
-os.environ['SSL_CERT_FILE'] = certifi.where()
-os.environ['REQUESTS_CA_BUNDLE'] = certifi.where()
-os.environ['CURL_CA_BUNDLE'] = certifi.where()
-
-from app.rag.integrations.drive import get_drive_service, resolve_type_from_mime, classify_from_path, download_file
-from app.rag.storage.sync_tracker import track_document_sync, mark_document_synced, mark_document_failed, document_needs_resync
+from app.rag.integrations.drive import get_drive_service, resolve_type_from_mime, classify_from_path, download_file, download_files_async, execute_batch, execute_with_retry, parse_drive_time, FILE_FIELDS
+from app.rag.storage.sync_tracker import track_document_sync, mark_document_synced, mark_document_failed, document_needs_resync, documents_needing_resync
 from app.rag.storage.index_qdrant import delete_document_chunks, upsert_document_chunks
 from app.rag.core.loaders import load_file_to_elements
 from app.rag.core.chunking import chunk_elements
@@ -151,7 +146,7 @@ async def _get_file_metadata_with_retry(service, file_id: str, max_retries: int
         try:
             file_metadata = service.files().get(
                 fileId=file_id,
-                fields='id,name,mimeType,modifiedTime,parents,webViewLink,trashed'
+                fields=f'{FILE_FIELDS},trashed'
             ).execute()
             return file_metadata
             
@@ -303,9 +298,7 @@ async def _handle_document_upsert(file_id: Optional[str]):
             return
         
         # Check if document needs sync
-        modified_time = datetime.fromisoformat(
-            file_metadata['modifiedTime'].replace('Z', '+00:00')
-        )
+        modified_time = parse_drive_time(file_metadata['modifiedTime'])
         
         # Check if document actually needs re-syncing based on modification time
         if document_needs_resync(file_id, modified_time):
@@ -322,8 +315,17 @@ async def _handle_document_upsert(file_id: Optional[str]):
         raise
 
 
-async def _process_single_document(service, file_metadata):
-    """Process a single document from Google Drive"""
+def _webhook_tmp_path(file_id: str, file_name: str) -> Path:
+    tmp_dir = Path(os.getenv("INGEST_TMP_DIR", ".ingest_tmp"))
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    return tmp_dir / f"webhook_{file_id}_{file_name}"
+
+
+async def _process_single_document(service, file_metadata, downloaded_path: Optional[Path] = None):
+    """Process a single document from Google Drive.
+
+    ``downloaded_path`` is set when the caller already fetched the file.
+    """
     file_id = file_metadata['id']
     file_name = file_metadata['name']
     mime_type = file_metadata['mimeType']
@@ -343,24 +345,25 @@ async def _process_single_document(service, file_metadata):
         except ConnectionError as e:
             logger.error(f"Failed to connect to vector database for deletion: {e}")
             mark_document_failed(file_id, f"Vector database connection failed: {str(e)}")
+            if downloaded_path is not None:
+                downloaded_path.unlink(missing_ok=True)
             return
         except Exception as e:
             logger.error(f"Failed to delete existing chunks for {file_name}: {e}")
             # Continue processing even if deletion fails
         
         # Download file to temporary location
-        tmp_dir = Path(os.getenv("INGEST_TMP_DIR", ".ingest_tmp"))
-        tmp_dir.mkdir(parents=True, exist_ok=True)
-        
-        dest_path = tmp_dir / f"webhook_{file_id}_{file_name}"
-        
-        try:
-            download_file(service, file_id, dest_path)
-            logger.info(f"Downloaded {file_name} to {dest_path}")
-        except Exception as e:
-            logger.error(f"Failed to download {file_name}: {e}")
-            mark_document_failed(file_id, f"Download failed: {str(e)}")
-            return
+        if downloaded_path is not None:
+            dest_path = downloaded_path
+        else:
+            dest_path = _webhook_tmp_path(file_id, file_name)
+            try:
+                download_file(service, file_id, dest_path)
+                logger.info(f"Downloaded {file_name} to {dest_path}")
+            except Exception as e:
+                logger.error(f"Failed to download {file_name}: {e}")
+                mark_document_failed(file_id, f"Download failed: {str(e)}")
+                return
         
         # Determine document classification (PI/Non-PI) from parents
         parents = file_metadata.get('parents', [])
@@ -380,9 +383,7 @@ async def _process_single_document(service, file_metadata):
             "roles_allowed": roles,
             "is_pi": is_pi,
             "folder_path": "/".join(folder_path),
-            "source_last_modified_at": datetime.fromisoformat(
-                file_metadata['modifiedTime'].replace('Z', '+00:00')
-            ),
+            "source_last_modified_at": parse_drive_time(file_metadata['modifiedTime']),
             "ingested_at": datetime.now(UTC),
             "language": "en",
         }
@@ -395,11 +396,15 @@ async def _process_single_document(service, file_metadata):
             else:
                 elements = load_file_to_elements(str(dest_path), base_meta)
             chunks = chunk_elements(elements)
+            # The chunks carry everything needed from here on; release the
+            # element dicts before the (slow) embed + upsert.
+            element_count = len(elements)
+            del elements
             
             if chunks:
                 try:
                     written = upsert_document_chunks(chunks)
-                    logger.info(f"Processed {file_name}: {len(elements)} elements, {len(chunks)} chunks, {written} indexed")
+                    logger.info(f"Processed {file_name}: {element_count} elements, {len(chunks)} chunks, {written} indexed")
                     
                     # Mark as successfully synced
                     mark_document_synced(file_id)
@@ -442,77 +447,102 @@ async def _scan_folder_for_changes(service, folder_id: str):
         
         logger.info(f"Scanning folder {folder_id} for files created or modified after {cutoff_str}")
         
-        # First, verify this is actually a folder by trying to get its metadata
-        try:
-            folder_metadata = service.files().get(
-                fileId=folder_id,
-                fields='id,name,mimeType'
-            ).execute()
-            logger.info(f"Confirmed folder: {folder_metadata.get('name')} (mime: {folder_metadata.get('mimeType')})")
-        except Exception as e:
-            logger.error(f"Could not access folder {folder_id}: {e}")
-            raise
-        
         # Query for recently modified OR created files in this folder and subfolders
         # When files are uploaded, they might be "created" rather than "modified"
         query = f"'{folder_id}' in parents and (modifiedTime > '{cutoff_str}' or createdTime > '{cutoff_str}') and trashed = false"
-        
-        results = service.files().list(
-            q=query,
-            fields='files(id,name,mimeType,modifiedTime,createdTime,parents,webViewLink,trashed)',
-            orderBy='modifiedTime desc',
-            pageSize=50
-        ).execute()
-        
-        files = results.get('files', [])
+        subfolder_query = f"'{folder_id}' in parents and mimeType = 'application/vnd.google-apps.folder' and trashed = false"
+
+        # The metadata calls for this folder are independent, so they go
+        # out as one HTTP batch request instead of one round-trip each.
+        requests = {
+            # Verify this is actually a folder by getting its metadata
+            'folder': service.files().get(
+                fileId=folder_id,
+                fields='id,name,mimeType'
+            ),
+            'recent': service.files().list(
+                q=query,
+                fields=f'files({FILE_FIELDS})',
+                orderBy='modifiedTime desc',
+                pageSize=50
+            ),
+            'subfolders': service.files().list(
+                q=subfolder_query,
+                fields='files(id,name)',
+                pageSize=50
+            ),
+        }
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        if debug_enabled:
+            # Debug: Also show all files (not just recently modified) to understand what's in the folder
+            requests['debug'] = service.files().list(
+                q=f"'{folder_id}' in parents and trashed = false",
+                fields='files(id,name,mimeType,modifiedTime,createdTime)',
+                orderBy='modifiedTime desc',
+                pageSize=10
+            )
+        responses = execute_batch(service, requests)
+        for request_id, (_, error) in responses.items():
+            if error is not None:
+                if request_id == 'folder':
+                    logger.error(f"Could not access folder {folder_id}: {error}")
+                raise error
+
+        folder_metadata = responses['folder'][0]
+        logger.info(f"Confirmed folder: {folder_metadata.get('name')} (mime: {folder_metadata.get('mimeType')})")
+
+        files = responses['recent'][0].get('files', [])
         logger.info(f"Found {len(files)} recently modified files in folder")
+
+        if debug_enabled:
+            debug_files = responses['debug'][0].get('files', [])
+            logger.debug("Total files in folder %s: %d", folder_id, len(debug_files))
+            for file in debug_files[:3]:  # Show first 3 files
+                logger.debug("File '%s' created at %s, modified at %s", file.get('name'), file.get('createdTime'), file.get('modifiedTime'))
+        
+        # Skip folders - we only want actual files
+        files = [f for f in files if f.get('mimeType') != 'application/vnd.google-apps.folder']
+        modified_times = {
+            f['id']: parse_drive_time(f['modifiedTime'])
+            for f in files
+        }
+        # Check which documents actually need re-syncing with a single query
+        stale_ids = documents_needing_resync(modified_times)
         
-        # Debug: Also show all files (not just recently modified) to understand what's in the folder
-        debug_results = service.files().list(
-            q=f"'{folder_id}' in parents and trashed = false",
-            fields='files(id,name,mimeType,modifiedTime,createdTime)',
-            orderBy='modifiedTime desc',
-            pageSize=10
-        ).execute()
-        debug_files = debug_results.get('files', [])
-        logger.info(f"Debug: Total files in folder {folder_id}: {len(debug_files)}")
-        for file in debug_files[:3]:  # Show first 3 files
-            logger.info(f"Debug: File '{file.get('name')}' created at {file.get('createdTime')}, modified at {file.get('modifiedTime')}")
-        
+        logger.info(f"{len(stale_ids)} of {len(files)} recently modified files in folder {folder_id} need syncing")
+
+        # Fetch the supported stale files concurrently up front instead of
+        # blocking the event loop on one download per file
+        downloads = {
+            f['id']: _webhook_tmp_path(f['id'], f['name'])
+            for f in files
+            if f['id'] in stale_ids and resolve_type_from_mime(f['name'], f['mimeType']) is not None
+        }
+        download_errors = await download_files_async(downloads) if downloads else {}
+
         # Process each file
         for file_metadata in files:
-            # Skip folders - we only want actual files
-            if file_metadata.get('mimeType') == 'application/vnd.google-apps.folder':
-                continue
-                
-            logger.info(f"Processing recently modified file: {file_metadata.get('name')}")
+            logger.debug("Processing recently modified file: %s", file_metadata.get('name'))
             
             # Process this file
             file_id = file_metadata['id']
             file_name = file_metadata['name']
+            modified_time = modified_times[file_id]
             
-            # Check if document needs sync
-            modified_time = datetime.fromisoformat(
-                file_metadata['modifiedTime'].replace('Z', '+00:00')
-            )
-            
-            # Check if document actually needs re-syncing
-            if document_needs_resync(file_id, modified_time):
-                logger.info(f"Document {file_name} from folder scan needs syncing - processing")
+            if file_id in stale_ids:
+                logger.debug("Document %s from folder scan needs syncing - processing", file_name)
                 track_document_sync(file_id, file_name, modified_time)
-                await _process_single_document(service, file_metadata)
+                error = download_errors.get(file_id)
+                if error is not None:
+                    logger.error(f"Failed to download {file_name}: {error}")
+                    mark_document_failed(file_id, f"Download failed: {str(error)}")
+                    continue
+                await _process_single_document(service, file_metadata, downloaded_path=downloads.get(file_id))
             else:
-                logger.info(f"Document {file_name} from folder scan is already up-to-date, skipping")
+                logger.debug("Document %s from folder scan is already up-to-date, skipping", file_name)
         
         # Also scan subfolders recursively
-        subfolder_query = f"'{folder_id}' in parents and mimeType = 'application/vnd.google-apps.folder' and trashed = false"
-        subfolder_results = service.files().list(
-            q=subfolder_query,
-            fields='files(id,name)',
-            pageSize=50
-        ).execute()
-        
-        subfolders = subfolder_results.get('files', [])
+        subfolders = responses['subfolders'][0].get('files', [])
         logger.info(f"Found {len(subfolders)} subfolders to scan")
         
         for subfolder in subfolders:
@@ -524,6 +554,44 @@ async def _scan_folder_for_changes(service, folder_id: str):
 
 
 # Function to set up Google Drive push notifications
+def _webhook_channel_body(webhook_url: str, folder_id: str) -> dict:
+    """Channel configuration for watching a folder, with a unique channel ID."""
+    unique_suffix = str(uuid.uuid4())[:8]
+    return {
+        'id': f'orris-sync-{folder_id}-{unique_suffix}',
+        'type': 'web_hook',
+        'address': webhook_url,
+        'payload': True,
+        'token': os.getenv("GOOGLE_WEBHOOK_TOKEN", "orris-webhook-token")
+    }
+
+
+def setup_drive_webhooks(webhook_url: str, folder_ids: List[str]) -> Dict[str, Tuple[Optional[dict], Optional[Exception]]]:
+    """
+    Set up Google Drive push notifications for many folders at once.
+    
+    The files.watch calls go out as HTTP batch requests (up to 100 per
+    round-trip) instead of one request each; a folder that is not accessible
+    fails only its own watch.
+    
+    Returns:
+        folder_id -> (channel information, exception); exactly one is None
+    """
+    service = get_drive_service()
+    files = service.files()
+    requests = {
+        folder_id: files.watch(fileId=folder_id, body=_webhook_channel_body(webhook_url, folder_id))
+        for folder_id in folder_ids
+    }
+    results = execute_batch(service, requests)
+    for folder_id, (_, error) in results.items():
+        if error is not None:
+            logger.error(f"Failed to set up webhook for folder {folder_id}: {error}")
+    succeeded = sum(1 for _, error in results.values() if error is None)
+    logger.info(f"Set up {succeeded} of {len(folder_ids)} folder webhooks with batched requests")
+    return results
+
+
 def setup_drive_webhook(webhook_url: str, folder_id: str) -> dict:
     """
     Set up Google Drive push notifications for a specific folder.
@@ -543,33 +611,24 @@ def setup_drive_webhook(webhook_url: str, folder_id: str) -> dict:
         
         # Verify folder exists and is accessible
         try:
-            folder_info = service.files().get(fileId=folder_id, fields="id,name,mimeType").execute()
+            folder_info = execute_with_retry(service.files().get(fileId=folder_id, fields="id,name,mimeType"))
             logger.info(f"Target folder verified: {folder_info.get('name')} ({folder_info.get('id')})")
         except Exception as folder_error:
             logger.error(f"Cannot access folder {folder_id}: {folder_error}")
             raise RuntimeError(f"Folder {folder_id} not accessible: {folder_error}")
         
         # Channel configuration with unique ID
-        import uuid
-        unique_suffix = str(uuid.uuid4())[:8]
-        channel_id = f'orris-sync-{folder_id}-{unique_suffix}'
-        
-        channel_body = {
-            'id': channel_id,
-            'type': 'web_hook',
-            'address': webhook_url,
-            'payload': True,
-            'token': os.getenv("GOOGLE_WEBHOOK_TOKEN", "orris-webhook-token")
-        }
+        channel_body = _webhook_channel_body(webhook_url, folder_id)
+        channel_id = channel_body['id']
         
         logger.info(f"Setting up webhook channel: {channel_id}")
         logger.info(f"Webhook payload: {channel_body}")
         
         # Watch the folder for changes
-        response = service.files().watch(
+        response = execute_with_retry(service.files().watch(
             fileId=folder_id,
             body=channel_body
-        ).execute()
+        ))
         
         logger.info(f"✅ Webhook setup successful! Response: {response}")
         return response
@@ -156,17 +156,17 @@ class WebhookChannelService:
 
     @staticmethod
     def migrate_from_json_file(db: Session, json_file_path: str) -> int:
-        """Migrate webhook channels from JSON file to database"""
-        import json
-        import os
+        """Migrate webhook channels from the JSON file (and its .jsonl channel log) to database"""
+        from pathlib import Path
+        from app.rag.storage import webhook_channel_log
 
-        if not os.path.exists(json_file_path):
+        channels_file = Path(json_file_path)
+        if not webhook_channel_log.channels_exist(channels_file):
             logger.info(f"JSON file not found: {json_file_path}")
             return 0
 
         try:
-            with open(json_file_path, 'r') as f:
-                channels_data = json.load(f)
+            channels_data = list(webhook_channel_log.load_channels(channels_file).values())
 
             migrated_count = 0
             for channel_data in channels_data:
@@ -2,9 +2,10 @@ import logging
 import os
 from datetime import datetime, timedelta
 import asyncio
-from typing import List, Dict, Set
+from typing import List, Dict
 from googleapiclient.errors import HttpError
-from app.services.sync_service import setup_drive_webhook
+from app.services.sync_service import setup_drive_webhook, setup_drive_webhooks
+from app.rag.integrations.drive import walk_folders
 from app.services.webhook_channel_service import WebhookChannelService
 from app.core.database import get_db
 
@@ -33,30 +34,17 @@ class DriveFolderService:
             logger.error(f"Error listing subfolders for {parent_folder_id}: {e}")
             return []
     
-    def list_all_subfolders_recursive(self, parent_folder_id: str, max_depth: int = 3, visited: Set[str] = None) -> List[Dict]:
-        """Get all subfolders recursively with depth limit to prevent infinite loops"""
-        if visited is None:
-            visited = set()
+    def list_all_subfolders_recursive(self, parent_folder_id: str, max_depth: int = 3) -> List[Dict]:
+        """Get all subfolders recursively with depth limit to prevent infinite loops.
         
-        if parent_folder_id in visited or max_depth <= 0:
-            return []
-        
-        visited.add(parent_folder_id)
+        Each tree level is listed with folders-only queries covering many
+        parents at once (see walk_folders) instead of one files.list per folder.
+        """
         all_folders = []
         
         try:
-            # Get immediate children
-            immediate_folders = self.list_immediate_subfolders(parent_folder_id)
-            all_folders.extend(immediate_folders)
-            
-            # Recursively get subfolders of each child
-            for folder in immediate_folders:
-                subfolders = self.list_all_subfolders_recursive(
-                    folder['id'], 
-                    max_depth - 1, 
-                    visited.copy()  # Pass a copy to avoid shared state issues
-                )
-                all_folders.extend(subfolders)
+            for folder, _depth in walk_folders(self.drive_service, parent_folder_id, max_depth=max_depth):
+                all_folders.append(folder)
             
             logger.info(f"Found total {len(all_folders)} folders under {parent_folder_id}")
             return all_folders
@@ -105,7 +93,7 @@ def get_folders_for_webhook_monitoring(drive_service, root_folder_id: str, inclu
 async def initialize_webhooks_if_needed():
     """Initialize webhooks if no active webhooks exist and environment variables are set"""
     from app.core.database import SessionLocal
-    from app.rag.integrations.drive import get_drive_service  # Assume this exists
+    from app.rag.integrations.drive import get_drive_service, batch_get_metadata
     
     db = SessionLocal()
     try:
@@ -139,28 +127,33 @@ async def initialize_webhooks_if_needed():
         )
         
         created_count = 0
-        
+        folders_needing_webhooks = []
         for folder_id in folders_to_monitor:
             # Check if we already have an active webhook for this folder
             existing_channels = WebhookChannelService.get_webhook_channels_for_folder(db, folder_id, "active")
             if existing_channels:
                 logger.info(f"Active webhook already exists for folder {folder_id}")
                 continue
-            
-            logger.info(f"Initializing webhook for folder {folder_id} with URL {webhook_url}")
-            
+            folders_needing_webhooks.append(folder_id)
+        
+        logger.info(f"Initializing webhooks for {len(folders_needing_webhooks)} folders with URL {webhook_url}")
+        # Folder names for the channel descriptions and the watch calls
+        # themselves go out in batched round-trips
+        folder_info_by_id = batch_get_metadata(drive_service, folders_needing_webhooks, fields="id,name")
+        watch_results = setup_drive_webhooks(webhook_url, folders_needing_webhooks)
+        
+        for folder_id in folders_needing_webhooks:
             try:
                 # Setup the webhook
-                channel_info = setup_drive_webhook(webhook_url, folder_id)
+                channel_info, error = watch_results[folder_id]
+                if error is not None:
+                    raise error
                 
                 # Get folder name for description
-                try:
-                    folder_info = drive_service.files().get(
-                        fileId=folder_id,
-                        fields="name"
-                    ).execute()
+                folder_info = folder_info_by_id.get(folder_id)
+                if folder_info is not None:
                     folder_name = folder_info.get('name', f'Folder {folder_id}')
-                except:
+                else:
                     folder_name = "Main RAG Folder" if folder_id == root_folder_id else f"Subfolder {folder_id}"
                 
                 # Create the webhook channel in database
@@ -280,7 +273,7 @@ async def ensure_webhook_initialized():
 async def refresh_webhook_folders():
     """Discover new subfolders and create webhooks for them if needed"""
     from app.core.database import SessionLocal
-    from app.rag.integrations.drive import get_drive_service
+    from app.rag.integrations.drive import get_drive_service, batch_get_metadata
     
     db = SessionLocal()
     try:
@@ -316,18 +309,22 @@ async def refresh_webhook_folders():
             return 0
         
         created_count = 0
+        folder_info_by_id = batch_get_metadata(drive_service, new_folders, fields="id,name")
+        # Only folders whose name could be fetched get a watch, as before
+        watch_results = setup_drive_webhooks(webhook_url, [f for f in new_folders if f in folder_info_by_id])
         
         for folder_id in new_folders:
             try:
                 # Get folder name
-                folder_info = drive_service.files().get(
-                    fileId=folder_id,
-                    fields="name"
-                ).execute()
+                folder_info = folder_info_by_id.get(folder_id)
+                if folder_info is None:
+                    raise RuntimeError(f"Could not fetch metadata for folder {folder_id}")
                 folder_name = folder_info.get('name', f'Folder {folder_id}')
                 
                 # Setup the webhook
-                channel_info = setup_drive_webhook(webhook_url, folder_id)
+                channel_info, error = watch_results[folder_id]
+                if error is not None:
+                    raise error
                 
                 # Create the webhook channel in database
                 channel_data = {
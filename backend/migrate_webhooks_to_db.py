@@ -25,7 +25,7 @@ def main():
 
         if migrated_count > 0:
             print(f"✅ Successfully migrated {migrated_count} webhook channels to database")
-            print("📝 You can now safely remove the webhook_channels.json file")
+            print("📝 You can now safely remove the webhook_channels.json and webhook_channels.jsonl files")
         elif migrated_count == 0:
             print("ℹ️  No webhook channels found to migrate or already migrated")
 
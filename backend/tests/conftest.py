@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Make the backend's `app` package importable when pytest is run from tests/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
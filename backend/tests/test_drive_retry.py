@@ -0,0 +1,139 @@
+"""Tests for retrying rate-limited and failed Drive API calls."""
+import pytest
+
+pytest.importorskip("googleapiclient")
+import httplib2
+from googleapiclient.errors import HttpError
+
+from app.rag.integrations import drive
+
+
+def _http_error(status, retry_after=None):
+    headers = {"status": str(status)}
+    if retry_after is not None:
+        headers["retry-after"] = retry_after
+    return HttpError(httplib2.Response(headers), b"")
+
+
+class _FakeBatch:
+    def __init__(self, service, callback):
+        self._service = service
+        self._callback = callback
+        self._request_ids = []
+
+    def add(self, request, request_id):
+        self._request_ids.append(request_id)
+
+    def execute(self):
+        self._service.batches.append(list(self._request_ids))
+        for request_id in self._request_ids:
+            outcome = self._service.outcomes[request_id].pop(0)
+            if isinstance(outcome, Exception):
+                self._callback(request_id, None, outcome)
+            else:
+                self._callback(request_id, outcome, None)
+
+
+class _FakeService:
+    """Answers each sub-request with the next scripted response or error."""
+
+    def __init__(self, outcomes):
+        self.outcomes = outcomes
+        self.batches = []
+
+    def new_batch_http_request(self, callback):
+        return _FakeBatch(self, callback)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(drive.time, "sleep", recorded.append)
+    return recorded
+
+
+def test_execute_batch_resends_only_retryable_sub_requests(sleeps):
+    service = _FakeService({
+        "ok": [{"id": "ok"}],
+        "limited": [_http_error(429, retry_after="3"), {"id": "limited"}],
+        "unavailable": [_http_error(503), {"id": "unavailable"}],
+        "missing": [_http_error(404)],
+    })
+
+    results = drive.execute_batch(service, {request_id: object() for request_id in service.outcomes})
+
+    assert service.batches == [["ok", "limited", "unavailable", "missing"], ["limited", "unavailable"]]
+    assert results["ok"] == ({"id": "ok"}, None)
+    assert results["limited"] == ({"id": "limited"}, None)
+    assert results["unavailable"] == ({"id": "unavailable"}, None)
+    response, error = results["missing"]
+    assert response is None and error.resp.status == 404
+    # The server's Retry-After is used instead of a jittered delay
+    assert sleeps == [3.0]
+
+
+def test_execute_batch_backs_off_with_jitter_and_gives_up(sleeps, monkeypatch):
+    monkeypatch.setattr(drive, "DRIVE_NUM_RETRIES", 2)
+    service = _FakeService({"busy": [_http_error(500), _http_error(502), _http_error(503)]})
+
+    results = drive.execute_batch(service, {"busy": object()})
+
+    assert service.batches == [["busy"], ["busy"], ["busy"]]
+    response, error = results["busy"]
+    assert response is None and error.resp.status == 503
+    assert len(sleeps) == 2
+    assert all(0 <= delay <= 2.0 ** attempt for attempt, delay in enumerate(sleeps))
+
+
+def test_execute_batch_splits_at_the_batch_limit(sleeps, monkeypatch):
+    monkeypatch.setattr(drive, "MAX_BATCH_REQUESTS", 2)
+    service = _FakeService({f"f{i}": [{"id": f"f{i}"}] for i in range(5)})
+
+    results = drive.execute_batch(service, {request_id: object() for request_id in service.outcomes})
+
+    assert service.batches == [["f0", "f1"], ["f2", "f3"], ["f4"]]
+    assert all(error is None for _, error in results.values())
+    assert sleeps == []
+
+
+class _FakeRequest:
+    def __init__(self, *outcomes):
+        self._outcomes = list(outcomes)
+        self.calls = 0
+
+    def execute(self):
+        self.calls += 1
+        outcome = self._outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def test_execute_with_retry_honours_retry_after(sleeps):
+    waited_before = drive.retry_wait_seconds()
+    request = _FakeRequest(_http_error(429, retry_after="7"), _http_error(503, retry_after="120"), {"id": "f1"})
+
+    assert drive.execute_with_retry(request) == {"id": "f1"}
+    assert request.calls == 3
+    # Retry-After is capped at MAX_RETRY_DELAY
+    assert sleeps == [7.0, drive.MAX_RETRY_DELAY]
+    assert drive.retry_wait_seconds() - waited_before == pytest.approx(7.0 + drive.MAX_RETRY_DELAY)
+
+
+def test_execute_with_retry_raises_other_errors_at_once(sleeps):
+    request = _FakeRequest(_http_error(404))
+
+    with pytest.raises(HttpError):
+        drive.execute_with_retry(request)
+    assert request.calls == 1
+    assert sleeps == []
+
+
+def test_execute_with_retry_gives_up_after_the_retry_limit(sleeps, monkeypatch):
+    monkeypatch.setattr(drive, "DRIVE_NUM_RETRIES", 1)
+    request = _FakeRequest(ConnectionResetError("reset"), _http_error(500))
+
+    with pytest.raises(HttpError):
+        drive.execute_with_retry(request)
+    assert request.calls == 2
+    assert len(sleeps) == 1
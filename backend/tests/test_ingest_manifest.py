@@ -0,0 +1,49 @@
+"""Tests for the manifest that lets local re-ingests skip unchanged files."""
+import os
+
+from app.rag.storage.ingest_manifest import IngestManifest
+
+
+def _changed_paths(manifest, paths):
+    """The files a re-ingest would process, as _source_local decides it."""
+    return [p for p in paths if not manifest.is_unchanged(p, p.stat())]
+
+
+def test_recorded_files_are_skipped_until_they_change(tmp_path):
+    report = tmp_path / "docs" / "report.txt"
+    notes = tmp_path / "docs" / "notes.txt"
+    report.parent.mkdir()
+    report.write_text("first draft")
+    notes.write_text("meeting notes")
+    paths = [report, notes]
+
+    manifest = IngestManifest(tmp_path / "manifest" / "ingest_manifest.sqlite")
+    assert _changed_paths(manifest, paths) == paths
+
+    manifest.record([(p, p.stat(), 3) for p in paths])
+    assert _changed_paths(manifest, paths) == []
+
+    # A different size marks the file as changed
+    report.write_text("second, longer draft")
+    assert _changed_paths(manifest, paths) == [report]
+
+    # So does a new mtime with the same size
+    st = notes.stat()
+    os.utime(notes, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert _changed_paths(manifest, paths) == [report, notes]
+    manifest.close()
+
+
+def test_records_persist_across_runs(tmp_path):
+    doc = tmp_path / "doc.txt"
+    doc.write_text("content")
+    db_path = tmp_path / "ingest_manifest.sqlite"
+
+    manifest = IngestManifest(db_path)
+    manifest.record([(doc, doc.stat(), 1)])
+    manifest.close()
+
+    reopened = IngestManifest(db_path)
+    assert reopened.is_unchanged(doc, doc.stat())
+    assert not reopened.is_unchanged(tmp_path / "other.txt", doc.stat())
+    reopened.close()
@@ -0,0 +1,65 @@
+"""Tests for the SQLite cache of parsed Drive elements."""
+from datetime import datetime, timezone
+
+from app.rag.storage.parse_cache import ParseCache
+
+
+def _elements(image_url=None):
+    return [
+        {"text": "Quarterly revenue", "meta": {"source_doc_id": "f1", "ingested_at": datetime(2024, 5, 1, tzinfo=timezone.utc)}},
+        {"text": "A bar chart", "meta": {"source_doc_id": "f1", "is_image": True, "image_url": image_url}},
+    ]
+
+
+def test_hit_returns_stored_elements(tmp_path):
+    cache = ParseCache(tmp_path / "parse_cache.sqlite")
+    cache.put("f1", "md5:text", _elements())
+    cache.commit()
+
+    elements = cache.get("f1", "md5:text")
+
+    assert [el["text"] for el in elements] == ["Quarterly revenue", "A bar chart"]
+    # Stored as JSON: datetimes come back as ISO strings
+    assert elements[0]["meta"]["ingested_at"] == "2024-05-01T00:00:00+00:00"
+    cache.close()
+
+
+def test_hit_survives_reopening(tmp_path):
+    db_path = tmp_path / "parse_cache.sqlite"
+    cache = ParseCache(db_path)
+    cache.put("f1", "md5:text", _elements())
+    cache.commit()
+    cache.close()
+
+    reopened = ParseCache(db_path)
+    assert reopened.get("f1", "md5:text") is not None
+    reopened.close()
+
+
+def test_miss_for_unknown_file_or_other_content_key(tmp_path):
+    cache = ParseCache(tmp_path / "parse_cache.sqlite")
+    cache.put("f1", "md5:text", _elements())
+
+    assert cache.get("f2", "md5:text") is None
+    assert cache.get("f1", "md5:vision") is None
+    assert cache.get("f1", "other-md5:text") is None
+
+    # A new content key replaces the row
+    cache.put("f1", "other-md5:text", _elements())
+    assert cache.get("f1", "md5:text") is None
+    assert cache.get("f1", "other-md5:text") is not None
+    cache.close()
+
+
+def test_miss_when_cached_images_were_deleted(tmp_path):
+    image = tmp_path / "_images" / "f1" / "page1.png"
+    image.parent.mkdir(parents=True)
+    image.write_bytes(b"\x89PNG")
+    cache = ParseCache(tmp_path / "parse_cache.sqlite")
+    cache.put("f1", "md5:vision", _elements(image_url=str(image)))
+
+    assert cache.get("f1", "md5:vision") is not None
+
+    image.unlink()
+    assert cache.get("f1", "md5:vision") is None
+    cache.close()
@@ -0,0 +1,90 @@
+"""Tests for the JSON Lines webhook channel log."""
+import json
+
+from app.rag.storage import webhook_channel_log
+from app.rag.storage.webhook_channel_log import (
+    append_record,
+    compact,
+    compact_if_needed,
+    load_channels,
+    log_path,
+    read_channels,
+)
+
+
+def _channel(channel_id, **extra):
+    return {"channel_id": channel_id, "folder_id": f"folder-{channel_id}", "status": "active", **extra}
+
+
+def _log_lines(channels_file):
+    return [json.loads(line) for line in log_path(channels_file).read_text().splitlines() if line.strip()]
+
+
+def test_updates_fold_into_appended_channels(tmp_path):
+    channels_file = tmp_path / "webhook_channels.json"
+    append_record(channels_file, _channel("a"))
+    append_record(channels_file, _channel("b"))
+    append_record(channels_file, {"op": "update", "channel_id": "a", "status": "stopped"})
+    # Updates for channels never saved are ignored
+    append_record(channels_file, {"op": "update", "channel_id": "ghost", "status": "stopped"})
+
+    channels, line_count = read_channels(channels_file)
+
+    assert line_count == 4
+    assert set(channels) == {"a", "b"}
+    assert channels["a"]["status"] == "stopped"
+    assert channels["a"]["folder_id"] == "folder-a"
+    assert channels["b"]["status"] == "active"
+    assert "op" not in channels["a"]
+
+
+def test_log_overrides_legacy_json_array(tmp_path):
+    channels_file = tmp_path / "webhook_channels.json"
+    channels_file.write_text(json.dumps([_channel("old"), _channel("a", expiration=1)]))
+    append_record(channels_file, {"op": "update", "channel_id": "old", "status": "stopped"})
+    append_record(channels_file, _channel("a", expiration=2))
+
+    channels = load_channels(channels_file)
+
+    assert channels["old"]["status"] == "stopped"
+    assert channels["a"]["expiration"] == 2
+    # Reading never modifies either file
+    assert json.loads(channels_file.read_text())[0]["status"] == "active"
+
+
+def test_compact_keeps_folded_state_and_legacy_file(tmp_path):
+    channels_file = tmp_path / "webhook_channels.json"
+    legacy = [_channel("old")]
+    channels_file.write_text(json.dumps(legacy))
+    append_record(channels_file, _channel("a"))
+    append_record(channels_file, {"op": "update", "channel_id": "a", "status": "stopped"})
+    append_record(channels_file, {"op": "update", "channel_id": "old", "status": "stopped"})
+    before = load_channels(channels_file)
+
+    compact(channels_file)
+
+    lines = _log_lines(channels_file)
+    assert sorted(record["channel_id"] for record in lines) == ["a", "old"]
+    assert all("op" not in record for record in lines)
+    assert load_channels(channels_file) == before
+    assert json.loads(channels_file.read_text()) == legacy
+    assert not log_path(channels_file).with_suffix(".jsonl.tmp").exists()
+
+    # Appends after a compaction still fold over the compacted records
+    append_record(channels_file, {"op": "update", "channel_id": "a", "status": "active"})
+    assert load_channels(channels_file)["a"]["status"] == "active"
+
+
+def test_compact_if_needed_waits_for_updates_to_pile_up(tmp_path):
+    channels_file = tmp_path / "webhook_channels.json"
+    assert compact_if_needed(channels_file) is False
+
+    append_record(channels_file, _channel("a"))
+    for _ in range(webhook_channel_log.COMPACT_RATIO - 1):
+        append_record(channels_file, {"op": "update", "channel_id": "a", "status": "stopped"})
+    assert compact_if_needed(channels_file) is False
+    assert len(_log_lines(channels_file)) == webhook_channel_log.COMPACT_RATIO
+
+    append_record(channels_file, {"op": "update", "channel_id": "a", "status": "stopped"})
+    assert compact_if_needed(channels_file) is True
+    assert _log_lines(channels_file) == [_channel("a", status="stopped")]